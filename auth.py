@@ -1,8 +1,12 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from jose import jwk, jwt, JWTError
+from collections import OrderedDict
 from dotenv import load_dotenv
+import hashlib
 import os
+import threading
+import time
 import requests
 
 # Load environment variables from .env
@@ -12,30 +16,152 @@ AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_AUDIENCE = os.getenv("AUTH0_API_AUDIENCE")
 ALGORITHMS = ["RS256"]
 
+# Point at a local JWKS stand-in for tests
+JWKS_URL = os.getenv("AUTH0_JWKS_URL", f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))  # seconds
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))  # on unknown kid
+JWKS_WAIT_TIMEOUT = float(os.getenv("JWKS_WAIT_TIMEOUT", "5"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
 http_bearer = HTTPBearer()
 
-# Cache the JWKS to avoid re-downloading on every request
-jwks = requests.get(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json").json()
+# === Signing keys ===
+# Constructed RSA keys by kid. Fetched in a background thread (at startup and
+# every JWKS_REFRESH_INTERVAL, or early when a token names an unknown kid),
+# so neither import nor requests block on Auth0.
+signing_keys = {}
+_keys_lock = threading.Lock()
+_refresh_wanted = threading.Event()
+_stop_refresh = threading.Event()
+_refreshed = threading.Condition(_keys_lock)
+_last_refresh = 0.0
+_refresh_thread = None
+
+
+def fetch_signing_keys():
+    jwks = requests.get(JWKS_URL, timeout=10).json()
+    keys = {}
+    for key in jwks["keys"]:
+        if key.get("kty") != "RSA" or "kid" not in key:
+            continue
+        keys[key["kid"]] = jwk.construct({
+            "kty": key["kty"],
+            "kid": key["kid"],
+            "use": key.get("use", "sig"),
+            "n": key["n"],
+            "e": key["e"],
+        }, algorithm="RS256")
+    return keys
+
+
+def refresh_signing_keys():
+    global signing_keys, _last_refresh
+    try:
+        keys = fetch_signing_keys()
+    except Exception as e:
+        print(f"⚠️ JWKS refresh failed: {e}")
+        keys = None
+    with _keys_lock:
+        _last_refresh = time.time()
+        if keys is not None:
+            signing_keys = keys
+        _refreshed.notify_all()
+
+
+def _refresh_loop():
+    while not _stop_refresh.is_set():
+        refresh_signing_keys()
+        _refresh_wanted.wait(timeout=JWKS_REFRESH_INTERVAL)
+        _refresh_wanted.clear()
+
+
+def start_jwks_refresh():
+    """
+    Start the background JWKS refresher (idempotent). Call once at app startup.
+    """
+    global _refresh_thread
+    if _refresh_thread is None or not _refresh_thread.is_alive():
+        _stop_refresh.clear()
+        _refresh_thread = threading.Thread(target=_refresh_loop, name="jwks-refresh", daemon=True)
+        _refresh_thread.start()
+
+
+def stop_jwks_refresh():
+    """
+    Stop the background JWKS refresher and wait for it to exit. Call at app shutdown.
+    """
+    global _refresh_thread
+    if _refresh_thread is not None:
+        _stop_refresh.set()
+        _refresh_wanted.set()
+        _refresh_thread.join()
+        _refresh_thread = None
+
+
+def get_signing_key(kid):
+    """
+    Key for `kid`. On a miss, ask for an early refresh (rate limited) and wait
+    briefly for it, which covers both cold start and key rotation.
+    """
+    key = signing_keys.get(kid)
+    if key is not None:
+        return key
+
+    start_jwks_refresh()
+    with _keys_lock:
+        if _last_refresh == 0:
+            # First fetch still in flight
+            _refreshed.wait(timeout=JWKS_WAIT_TIMEOUT)
+        elif time.time() - _last_refresh >= JWKS_MIN_REFRESH_INTERVAL:
+            _refresh_wanted.set()
+            _refreshed.wait(timeout=JWKS_WAIT_TIMEOUT)
+    return signing_keys.get(kid)
+
+
+# === Verified-token cache ===
+# sha256(token) -> (payload, exp). A token is verified once and then trusted
+# until its own expiry; the cache is LRU-bounded.
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+def _cached_payload(token_hash):
+    with _verified_lock:
+        entry = _verified.get(token_hash)
+        if entry is None:
+            return None
+        payload, exp = entry
+        if exp <= time.time():
+            del _verified[token_hash]
+            return None
+        _verified.move_to_end(token_hash)
+        return payload
+
+
+def _cache_payload(token_hash, payload):
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)):
+        return
+    with _verified_lock:
+        _verified[token_hash] = (payload, exp)
+        _verified.move_to_end(token_hash)
+        while len(_verified) > TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(http_bearer)):
     token = credentials.credentials
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    payload = _cached_payload(token_hash)
+    if payload is not None:
+        return payload
 
     try:
         unverified_header = jwt.get_unverified_header(token)
 
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"],
-                }
-                break
-
-        if not rsa_key:
+        rsa_key = get_signing_key(unverified_header.get("kid"))
+        if rsa_key is None:
             raise HTTPException(status_code=401, detail="Invalid token header.")
 
         # Verify and decode the JWT
@@ -47,7 +173,8 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(http_bearer
             issuer=f"https://{AUTH0_DOMAIN}/"
         )
 
-        return payload  # You can access user info in your route if needed
-
     except JWTError:
         raise HTTPException(status_code=401, detail="Token verification failed")
+
+    _cache_payload(token_hash, payload)
+    return payload  # You can access user info in your route if needed
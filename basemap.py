@@ -0,0 +1,200 @@
+import json
+import math
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import datasets
+
+# === Pre-rendered choropleth basemaps ===
+# `python basemap.py` rasterizes the fire and desertification layers once into
+# georeferenced image pyramids (EPSG:4326, one .npy per level). At request time
+# the 100 km window around the point is sliced out of a memory-mapped level,
+# the marker drawn and the result encoded, with no polygon rendering at all.
+BASEMAP_DIR = os.getenv("BASEMAP_DIR", "data/basemaps")
+BASE_RESOLUTION = 0.004  # degrees per pixel at level 0 (~400 m)
+PYRAMID_LEVELS = 3
+KM_PER_DEGREE = 111.32
+
+# Separate rasters so the ocean between the peninsula and the Canarias is not stored
+EXTENTS = {
+    "peninsula": (-9.6, 35.0, 4.6, 44.0),
+    "canarias": (-18.4, 27.4, -13.2, 29.6),
+}
+
+basemaps = {}
+version = None  # datasets.file_version of the mapped pyramids
+
+
+def load_basemaps(directory=BASEMAP_DIR):
+    """
+    Memory-map every pyramid described by a <layer>.json in `directory`.
+    Missing directories are fine: callers fall back to matplotlib rendering.
+    """
+    global version
+    basemaps.clear()
+    version = None
+    if not os.path.isdir(directory):
+        return basemaps
+    version = datasets.file_version([directory])
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        for extent in meta["extents"].values():
+            for level in extent["levels"]:
+                level["pixels"] = np.load(os.path.join(directory, level["file"]), mmap_mode="r")
+        basemaps[meta["name"]] = meta
+    return basemaps
+
+
+def _pick_level(levels, degrees_per_pixel):
+    # Coarsest level that is still at least as detailed as the output needs
+    chosen = levels[0]
+    for level in levels:
+        if level["resolution"] <= degrees_per_pixel:
+            chosen = level
+    return chosen
+
+
+def _crop(pixels, bounds, resolution, min_lon, min_lat, max_lon, max_lat):
+    """
+    Slice a lon/lat window out of a level, padding with white where it leaves the raster.
+    """
+    left, _, _, top = bounds
+    col0 = int(math.floor((min_lon - left) / resolution))
+    col1 = int(math.ceil((max_lon - left) / resolution))
+    row0 = int(math.floor((top - max_lat) / resolution))
+    row1 = int(math.ceil((top - min_lat) / resolution))
+
+    height, width = pixels.shape[:2]
+    window = np.full((row1 - row0, col1 - col0, 3), 255, dtype=np.uint8)
+
+    src_r0, src_r1 = max(row0, 0), min(row1, height)
+    src_c0, src_c1 = max(col0, 0), min(col1, width)
+    if src_r0 < src_r1 and src_c0 < src_c1:
+        window[src_r0 - row0:src_r1 - row0, src_c0 - col0:src_c1 - col0] = pixels[src_r0:src_r1, src_c0:src_c1]
+    return window
+
+
+def draw_marker(image, x, y, size=8, width=2):
+    draw = ImageDraw.Draw(image)
+    draw.line([(x - size, y - size), (x + size, y + size)], fill="black", width=width)
+    draw.line([(x - size, y + size), (x + size, y - size)], fill="black", width=width)
+    return image
+
+
+def render_window(name, lat, lon, max_km=100, size=(480, 400)):
+    """
+    PIL image of the max_km window around the point cut from the `name` basemap,
+    with the point marked. Returns None when that basemap has not been built.
+    """
+    meta = basemaps.get(name)
+    if meta is None:
+        return None
+
+    extent = next(
+        (e for e in meta["extents"].values()
+         if e["bounds"][0] <= lon <= e["bounds"][2] and e["bounds"][1] <= lat <= e["bounds"][3]),
+        None,
+    )
+    if extent is None:
+        return None
+
+    width, height = size
+    half_lat = max_km / KM_PER_DEGREE
+    half_lon = half_lat * width / height / max(math.cos(math.radians(lat)), 1e-6)
+
+    level = _pick_level(extent["levels"], 2 * half_lat / height)
+    window = _crop(
+        level["pixels"], extent["bounds"], level["resolution"],
+        lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat,
+    )
+
+    image = Image.fromarray(window).resize(size, Image.BILINEAR)
+    return draw_marker(image, width / 2, height / 2)
+
+
+# === Offline build step ===
+def rasterize(geometries, facecolors, bounds, resolution, alpha, linewidth=0.2):
+    """
+    Draw every polygon of a layer into an RGB array covering `bounds` at `resolution` deg/px.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.collections import PathCollection
+    from utils import polygons_to_paths
+
+    min_lon, min_lat, max_lon, max_lat = bounds
+    width = int(round((max_lon - min_lon) / resolution))
+    height = int(round((max_lat - min_lat) / resolution))
+
+    fig = plt.figure(figsize=(width / 100, height / 100), dpi=100)
+    canvas = FigureCanvas(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(min_lon, max_lon)
+    ax.set_ylim(min_lat, max_lat)
+
+    paths, colors = polygons_to_paths(geometries, facecolors)
+    ax.add_collection(PathCollection(
+        paths, facecolors=colors, edgecolors="k", linewidths=linewidth, alpha=alpha,
+    ))
+
+    canvas.draw()
+    pixels = np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+    plt.close(fig)
+    return pixels
+
+
+def build_basemap(name, geometries, facecolors, alpha, directory=BASEMAP_DIR):
+    os.makedirs(directory, exist_ok=True)
+    meta = {"name": name, "crs": "EPSG:4326", "extents": {}}
+
+    for extent_name, bounds in EXTENTS.items():
+        pixels = rasterize(geometries, facecolors, bounds, BASE_RESOLUTION, alpha)
+        levels = []
+        image = Image.fromarray(pixels)
+        for level in range(PYRAMID_LEVELS):
+            filename = f"{name}_{extent_name}_{level}.npy"
+            np.save(os.path.join(directory, filename), np.asarray(image))
+            levels.append({"file": filename, "resolution": BASE_RESOLUTION * 2 ** level})
+            image = image.resize((max(image.width // 2, 1), max(image.height // 2, 1)), Image.BOX)
+        meta["extents"][extent_name] = {"bounds": list(bounds), "levels": levels}
+
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ Built basemap {name} in {directory}")
+
+
+def build_all(directory=BASEMAP_DIR):
+    from matplotlib import colormaps
+    from matplotlib.colors import Normalize
+    import data_load_fire
+    import data_load_desert
+    from risk_desert import RISK_COLORS
+
+    # Fire counts are normalized over the whole period, not per 100 km window
+    for name, period in (("fire_96_05", "9605"), ("fire_06_15", "0615")):
+        centroids = datasets.load(f"fire_{period}").centroids
+        values = centroids.values
+        norm = Normalize(vmin=values.min(), vmax=values.max())
+        colors = colormaps["Reds"](norm(values))
+        build_basemap(name, centroids.geometries, colors, alpha=0.7, directory=directory)
+
+    geometries = []
+    colors = []
+    for name in data_load_desert.SHAPEFILES:
+        frame = datasets.load(f"desert_{name}").gdf
+        geometries.extend(frame.geometry)
+        colors.extend(frame["DESER_CLA"].map(RISK_COLORS).fillna("black"))
+    build_basemap("desert", geometries, colors, alpha=0.5, directory=directory)
+
+
+if __name__ == "__main__":
+    build_all()
@@ -0,0 +1,150 @@
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+# === Local WMS stand-in ===
+# Replays recorded GetFeatureInfo answers for the three upstreams the WMS
+# providers call, so their benchmarks measure our code and not the network.
+# Each service lives under its own path prefix and answers are looked up by
+# QUERY_LAYERS (GetMap tiles as "GetMap:<layer>") in
+# benchmarks/recordings/<service>.json.
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+UPSTREAMS = {
+    "idee": "https://servicios.idee.es/wms-inspire/riesgos-naturales/inundaciones",
+    "miteco": "https://wmts.mapama.gob.es/sig/costas",
+    "ign": "https://www.ign.es/wms-inspire/geofisica",
+}
+
+
+def load_recordings(directory=RECORDINGS_DIR):
+    recordings = {}
+    for service in UPSTREAMS:
+        path = os.path.join(directory, f"{service}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                recordings[service] = json.load(f)
+        else:
+            recordings[service] = {}
+    return recordings
+
+
+def save_recordings(recordings, directory=RECORDINGS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for service, layers in recordings.items():
+        with open(os.path.join(directory, f"{service}.json"), "w", encoding="utf-8") as f:
+            json.dump(layers, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+class FakeWMSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        service, _, rest = parts.path.lstrip("/").partition("/")
+        query = {k.upper(): v for k, v in parse_qsl(parts.query, keep_blank_values=True)}
+        layer = query.get("QUERY_LAYERS") or query.get("LAYERS", "")
+        if query.get("REQUEST", "").lower() == "getmap":
+            layer = f"GetMap:{layer}"  # map tiles are recorded apart from feature info
+
+        if service not in UPSTREAMS:
+            return self._send(404, "text/plain", f"Unknown service {service!r}")
+
+        if server.record:
+            upstream = UPSTREAMS[service] + ("/" + rest if rest else "")
+            response = requests.get(upstream, params=parts.query, timeout=30)
+            entry = {
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", "text/plain"),
+            }
+            if entry["content_type"].startswith("image/"):
+                entry["body_base64"] = base64.b64encode(response.content).decode("ascii")
+            else:
+                entry["body"] = response.text
+            with server.lock:
+                server.recordings[service][layer] = entry
+        else:
+            entry = server.recordings[service].get(layer)
+            if entry is None:
+                return self._send(404, "text/plain", f"No recording for {service}/{layer}")
+
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if "body_base64" in entry:
+            self._send(entry["status"], entry["content_type"], base64.b64decode(entry["body_base64"]))
+        else:
+            self._send(entry["status"], entry["content_type"], entry["body"])
+
+    def _send(self, status, content_type, body):
+        payload = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.0, record=False):
+    """
+    Serve on 127.0.0.1 in a daemon thread. `latency` (seconds) is added to every
+    answer to mimic upstream round trips; `record` proxies to the real services
+    and keeps what they return. Returns the server; see service_urls().
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeWMSHandler)
+    server.daemon_threads = True
+    server.recordings = load_recordings()
+    server.record = record
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, name="fake-wms", daemon=True).start()
+    return server
+
+
+def service_urls(server):
+    """
+    Environment overrides that point the WMS providers at `server`.
+    """
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return {
+        "IDEE_WMS_URL": f"{base}/idee",
+        "MITECO_WMS_URL": f"{base}/miteco/{{layer}}/ows",
+        "IGN_WMS_URL": f"{base}/ign",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the IDEE, MITECO and IGN WMS services.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--record", action="store_true",
+                        help="proxy to the real services and save their answers to benchmarks/recordings")
+    args = parser.parse_args()
+
+    server = start(args.port, args.latency, args.record)
+    for name, url in service_urls(server).items():
+        print(f"{name}={url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if args.record:
+            save_recordings(server.recordings)
+            print(f"✅ Saved recordings to {RECORDINGS_DIR}")
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks import fake_wms
+
+# === Provider microbenchmarks ===
+# python -m benchmarks.run                      # run everything, print a table
+# python -m benchmarks.run --save               # ...and store it as this machine's baseline
+# python -m benchmarks.run --compare            # fail (exit 1) on regressions vs the baseline
+# python -m benchmarks.run -k fire --repeat 200 # only cases whose name contains "fire"
+#
+# Run from the repository root so the data/ paths resolve. The WMS-backed
+# providers talk to benchmarks/fake_wms.py, never to the real services.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Known points from the provider notes, then random ones inside the dataset extents
+FIXED_POINTS = [
+    (41.27270457818908, 2.0520473550222307),  # 100y & 500y fluvial risk
+    (41.27374622035448, 2.0522067636329004),  # 500y only
+    (41.27698190957095, 2.0510802904312824),  # no fluvial risk
+    (40.4168, -3.7038),
+    (37.3891, -5.9845),
+    (28.1235, -15.4363),
+]
+EXTENTS = {
+    "peninsula": (-9.3, 36.0, 3.3, 43.7),
+    "canarias": (-18.1, 27.6, -13.4, 29.4),
+}
+
+
+def sample_points(n, seed=0):
+    rng = random.Random(seed)
+    points = list(FIXED_POINTS)
+    while len(points) < n:
+        minx, miny, maxx, maxy = EXTENTS["canarias" if rng.random() < 0.1 else "peninsula"]
+        points.append((rng.uniform(miny, maxy), rng.uniform(minx, maxx)))
+    return points[:n]
+
+
+def build_cases(loop):
+    """
+    name -> callable(lat, lon). Imported here, after the environment points the
+    providers at the fake WMS and disables the persistent response cache.
+    """
+    import basemap
+    import data_load_desert
+    import data_load_fire
+    import datasets
+    import http_client
+    import risk_coastal_flood
+    import risk_desert
+    import risk_fire
+    import risk_fluvial_flood
+    import risk_seismic
+    import utils
+
+    datasets.start_loading()
+    datasets.wait_all()
+    basemap.load_basemaps()
+    loop.run_until_complete(http_client.start())
+
+    fire = data_load_fire.get("9605")
+    desert_frame, desert_centroids = data_load_desert.get("peninsula")
+
+    def run_async(provider):
+        return lambda lat, lon: loop.run_until_complete(provider(lat, lon))
+
+    return {
+        "fire.run": lambda lat, lon: risk_fire.run(lat, lon, images=False),
+        "fire.run[images]": lambda lat, lon: risk_fire.run(lat, lon, images=True),
+        "desert.run": lambda lat, lon: risk_desert.run(lat, lon, images=False),
+        "desert.run[images]": lambda lat, lon: risk_desert.run(lat, lon, images=True),
+        "utils.filter_polygons_near_point": lambda lat, lon: utils.filter_polygons_near_point(fire.centroids, lat, lon),
+        "utils.filter_polygons_near_point_desert": lambda lat, lon: utils.filter_polygons_near_point_desert(
+            desert_frame, desert_centroids, lat, lon),
+        "utils.generate_fire_map": lambda lat, lon: utils.generate_fire_map(
+            utils.filter_polygons_near_point(fire.centroids, lat, lon), lat, lon),
+        "utils.plot_full_dataset_with_point": lambda lat, lon: utils.plot_full_dataset_with_point(
+            desert_frame, desert_centroids, lat, lon, risk_desert.RISK_LABELS, risk_desert.RISK_COLORS),
+        "fluvial_flood.run": run_async(risk_fluvial_flood.run),
+        "coastal_flood.run": run_async(risk_coastal_flood.run),
+        "seismic.run": run_async(risk_seismic.run),
+    }
+
+
+def measure(fn, points, repeat, warmup, alloc_repeat):
+    """
+    Latency percentiles over `repeat` calls, then allocations over a separate,
+    shorter pass (tracemalloc slows everything down, so it is not timed).
+    """
+    for i in range(warmup):
+        fn(*points[i % len(points)])
+
+    timings = []
+    for i in range(repeat):
+        lat, lon = points[i % len(points)]
+        start = time.perf_counter()
+        fn(lat, lon)
+        timings.append(time.perf_counter() - start)
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_repeat):
+            lat, lon = points[i % len(points)]
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = fn(lat, lon)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+            del result
+    finally:
+        tracemalloc.stop()
+
+    ms = np.array(timings) * 1000
+    return {
+        "calls": repeat,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "peak_kib": float(np.mean(peaks) / 1024) if peaks else 0.0,
+        "retained_kib": float(np.mean(retained) / 1024) if retained else 0.0,
+    }
+
+
+def print_table(results, baseline=None):
+    header = f"{'case':42} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'kept KiB':>9}"
+    if baseline:
+        header += f" {'p50 x':>7} {'peak x':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = (f"{name:42} {r['p50_ms']:9.2f} {r['p90_ms']:9.2f} {r['p99_ms']:9.2f}"
+                f" {r['peak_kib']:10.1f} {r['retained_kib']:9.1f}")
+        if baseline and name in baseline:
+            line += f" {ratio(r['p50_ms'], baseline[name]['p50_ms']):7.2f} {ratio(r['peak_kib'], baseline[name]['peak_kib']):7.2f}"
+        print(line)
+
+
+def ratio(value, reference):
+    return value / reference if reference > 0 else 1.0
+
+
+def compare(results, baseline, tolerance, alloc_tolerance, min_delta_ms=0.1):
+    """
+    Regressions against a saved baseline: p50/p90 slower, or peak allocations
+    larger, by more than the given factors. Returns a list of messages.
+    """
+    regressions = []
+    for name, r in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        for key in ("p50_ms", "p90_ms"):
+            # Sub-millisecond lookups jitter by more than any sane factor
+            if r[key] - ref[key] > min_delta_ms and ratio(r[key], ref[key]) > tolerance:
+                regressions.append(f"{name}: {key} {ref[key]:.2f} -> {r[key]:.2f}")
+        # Ignore allocation noise in the few-KiB range
+        if r["peak_kib"] - ref["peak_kib"] > 64 and ratio(r["peak_kib"], ref["peak_kib"]) > alloc_tolerance:
+            regressions.append(f"{name}: peak_kib {ref['peak_kib']:.1f} -> {r['peak_kib']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the risk providers and map helpers.")
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--alloc-repeat", type=int, default=10)
+    parser.add_argument("--points", type=int, default=50, help="distinct query points to cycle through")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the fake WMS adds per answer")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, help="write results as a baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="allowed latency slowdown factor")
+    parser.add_argument("--alloc-tolerance", type=float, default=1.2, help="allowed peak allocation factor")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        # Baselines are machine-specific, so none is committed; each machine saves its own
+        if not os.path.exists(args.compare):
+            parser.error(f"no baseline at {args.compare}; run `python -m benchmarks.run --save` first")
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    server = fake_wms.start(latency=args.latency)
+    os.environ.update(fake_wms.service_urls(server))
+    os.environ["WMS_CACHE_ENABLED"] = "0"  # measure the upstream path, not cache hits
+    os.environ.setdefault("DATASET_WAIT_TIMEOUT", "600")
+
+    loop = asyncio.new_event_loop()
+    cases = {name: fn for name, fn in build_cases(loop).items() if args.pattern in name}
+    points = sample_points(args.points)
+
+    results = {}
+    for name, fn in cases.items():
+        print(f"⏱️ {name}", file=sys.stderr)
+        results[name] = measure(fn, points, args.repeat, args.warmup, args.alloc_repeat)
+    server.shutdown()
+
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "node": platform.node(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"✅ Baseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance, args.min_delta_ms)
+        if regressions:
+            print("⚠️ Regressions:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import argparse
+import os
+
+import pandas as pd
+import geopandas as gpd
+import requests
+
+import zone_store
+
+# === Local coastal flood zones ===
+# `python coastal_zones.py harvest` pages through MITECO's WFS once and keeps
+# the zim_laminas_q100/q500 flood-extent polygons, with their Cota máxima,
+# Cota media and Área attributes, as geobundles under data/coastal. Harvested
+# layers load with the other datasets at startup and risk_coastal_flood
+# answers from them; MITECO's GetFeatureInfo is only the fallback for layers
+# that were never harvested, or while they are still loading.
+# `python coastal_zones.py ingest --layer zim_laminas_q100 file.shp` stores an
+# already downloaded copy instead.
+COASTAL_ZONES_DIR = os.getenv("COASTAL_ZONES_DIR", "data/coastal")
+WFS_URL_TEMPLATE = os.getenv("MITECO_WFS_URL", "https://wmts.mapama.gob.es/sig/costas/{layer}/ows")
+WFS_PAGE_SIZE = int(os.getenv("MITECO_WFS_PAGE_SIZE", "1000"))
+
+LAYERS = ("zim_laminas_q100", "zim_laminas_q500")
+ATTRIBUTES = ("Cota máxima (m)", "Cota media (m)", "Área (km2)")
+
+store = zone_store.ZoneStore("coastal", COASTAL_ZONES_DIR, LAYERS)
+version = store.version
+
+
+def fetch_wfs(layer, page_size=WFS_PAGE_SIZE, bbox=None):
+    """
+    Every feature of `layer` from MITECO's WFS, page by page, as a GeoDataFrame.
+    Asked for in EPSG:3857 to sidestep EPSG:4326 axis-order differences.
+    """
+    url = WFS_URL_TEMPLATE.format(layer=layer)
+    frames = []
+    start = 0
+    while True:
+        params = {
+            "SERVICE": "WFS",
+            "VERSION": "2.0.0",
+            "REQUEST": "GetFeature",
+            "TYPENAMES": layer,
+            "OUTPUTFORMAT": "application/json",
+            "SRSNAME": "EPSG:3857",
+            "COUNT": str(page_size),
+            "STARTINDEX": str(start),
+        }
+        if bbox:
+            params["BBOX"] = ",".join(str(v) for v in bbox) + ",EPSG:3857"
+        response = requests.get(url, params=params, timeout=120)
+        response.raise_for_status()
+        features = response.json().get("features", [])
+        if features:
+            frames.append(gpd.GeoDataFrame.from_features(features, crs="EPSG:3857"))
+        print(f"  {layer}: {start + len(features)} features")
+        if len(features) < page_size:
+            break
+        start += len(features)
+
+    if not frames:
+        return gpd.GeoDataFrame(geometry=[], crs="EPSG:3857")
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs="EPSG:3857")
+
+
+def save(layer, gdf, directory=None):
+    path, count = store.write(layer, gdf, ATTRIBUTES, directory)
+    print(f"✅ Stored {count} {layer} flood zones in {path}")
+
+
+def lookup(layer, lat, lon):
+    """
+    Attributes of the flood zone containing the point ({} outside every zone), or
+    None when the layer has no local store (or it is not loaded yet) and MITECO must be asked.
+    """
+    found = store.find(layer, lat, lon)
+    if found is None:
+        return None
+    bundle, position = found
+    return {} if position is None else bundle.row(position)
+
+
+# === Registered for parallel loading at startup (only layers that were harvested) ===
+store.register()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store MITECO coastal flood zones locally.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    harvest_parser = sub.add_parser("harvest", help="download the layers from MITECO's WFS")
+    harvest_parser.add_argument("--layer", choices=LAYERS, action="append", help="default: both")
+    harvest_parser.add_argument("--page-size", type=int, default=WFS_PAGE_SIZE)
+    harvest_parser.add_argument("--bbox", type=float, nargs=4, metavar=("MINX", "MINY", "MAXX", "MAXY"),
+                                help="only this EPSG:3857 box")
+    ingest_parser = sub.add_parser("ingest", help="store a downloaded copy of one layer")
+    ingest_parser.add_argument("--layer", required=True, choices=LAYERS)
+    ingest_parser.add_argument("source", help="shapefile, GeoJSON or GeoPackage")
+    args = parser.parse_args()
+
+    if args.command == "harvest":
+        for layer in args.layer or LAYERS:
+            save(layer, fetch_wfs(layer, args.page_size, args.bbox))
+    else:
+        save(args.layer, gpd.read_file(args.source))
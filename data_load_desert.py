@@ -1,14 +1,62 @@
+import os
 import geopandas as gpd
+from collections import namedtuple
+from spatial_index import CentroidIndex, PolygonIndex
+import datasets
 
-# === Load shapefiles once ===
-shapefile_path1 = "data/pand_p.shp"
-shapefile_path2 = "data/pand_c.shp"
+# === Shapefiles, loaded in parallel at startup ===
+SHAPEFILES = {
+    "peninsula": "data/pand_p.shp",
+    "canarias": "data/pand_c.shp",
+}
 
-gdf = gpd.read_file(shapefile_path1)
-gdf2 = gpd.read_file(shapefile_path2)
+DesertData = namedtuple("DesertData", ["gdf", "centroids"])
 
-# Reproject if needed
-if gdf.crs != "EPSG:4326":
-    gdf = gdf.to_crs("EPSG:4326")
-if gdf2.crs != "EPSG:4326":
-    gdf2 = gdf2.to_crs("EPSG:4326")
+def load_shapefile(path):
+    gdf = gpd.read_file(path)
+
+    # Reproject if needed
+    if gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+
+    # Projected centroids for the 100 km map window, computed once
+    return DesertData(gdf, CentroidIndex(gdf.geometry.to_numpy()))
+
+def build_desert_index(desert_datasets):
+    """
+    One point-in-polygon index over every desertification dataset.
+    Each record is (dataset name, row position, DESER_CLA code).
+    """
+    geometries = []
+    records = []
+    for name, data in desert_datasets.items():
+        frame = data.gdf
+        for position, (geom, code) in enumerate(zip(frame.geometry, frame["DESER_CLA"])):
+            if geom is None or geom.is_empty:
+                continue
+            geometries.append(geom)
+            records.append((name, position, code))
+    return PolygonIndex(geometries, records)
+
+def get(name):
+    """
+    Loaded DesertData for "peninsula" or "canarias"; raises datasets.DatasetNotReady while loading.
+    """
+    return datasets.get(f"desert_{name}")
+
+def get_index():
+    return datasets.get("desert_index")
+
+
+def shapefile_sources(path):
+    base = os.path.splitext(path)[0]
+    return tuple(base + ext for ext in (".shp", ".shx", ".dbf", ".prj"))
+
+
+for _name, _path in SHAPEFILES.items():
+    datasets.register(f"desert_{_name}", lambda path=_path: load_shapefile(path), sources=shapefile_sources(_path))
+
+# The combined index is built as soon as both shapefiles are in
+datasets.register("desert_index", lambda: build_desert_index(
+    {name: datasets.load(f"desert_{name}") for name in SHAPEFILES}
+), sources=[source for path in SHAPEFILES.values() for source in shapefile_sources(path)])
@@ -1,38 +1,123 @@
 import json
-from shapely.geometry import shape, Polygon
+import os
+from collections import namedtuple
+import numpy as np
+from shapely.geometry import shape, Polygon, MultiPolygon
+from spatial_index import PolygonIndex, CentroidIndex
+import geobundle
+import datasets
+from utils import parse_fire_count
+
+# Each dataset loads from <base>.bundle (see write_fire_bundle) when present,
+# otherwise from <base>.geojson.
+FIRE_DATASETS = {
+    "9605": "data/fire_1996_2005",
+    "0615": "data/fire_2006_2015",
+}
+
+FireData = namedtuple("FireData", ["index", "centroids"])
 
 def load_geojson(filepath):
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def extract_polygons_and_values(geojson):
-    result = []
+def extract_features(geojson):
+    """
+    Parse every feature once: (geometries, properties, fire counts).
+    """
+    geometries = []
+    properties = []
+    fire_counts = []
     for feature in geojson["features"]:
         try:
-            poly = shape(feature["geometry"])
-
-            # Directly access the flat properties
-            properties = feature["properties"]
-            fire_count = None
-
-            for key, val in properties.items():
-                if "incendios" in key.lower():
-                    try:
-                        fire_count = int(val.replace(".", "").replace(",", ""))
-                        break
-                    except Exception as e:
-                        print(f"⚠️ Could not parse fire count: {val}")
-                        fire_count = None
-
-            result.append((poly, fire_count))
+            geometries.append(shape(feature["geometry"]))
+            properties.append(feature["properties"])
+            fire_counts.append(parse_fire_count(feature["properties"]))
         except Exception as e:
             print("⚠️ Skipped a feature:", e)
-    return result
+    return geometries, properties, fire_counts
+
+def extract_polygons_and_values(geojson):
+    geometries, _, fire_counts = extract_features(geojson)
+    return list(zip(geometries, fire_counts))
+
+def build_centroid_index(polygons_with_values):
+    """
+    Keep the valid polygons and project their centroids once, for the
+    100 km neighbourhood filter. Missing fire counts become 0.
+    """
+    geometries = []
+    values = []
+    for poly, val in polygons_with_values:
+        if isinstance(poly, (Polygon, MultiPolygon)) and poly.is_valid:
+            geometries.append(poly)
+            values.append(float(val) if val not in [None, ""] else 0.0)
+    return CentroidIndex(geometries, values)
+
+def write_features_bundle(geometries, properties, bundle_path):
+    """
+    Write fire polygons and their properties as the bundle read at startup, with
+    the parsed fire counts as an array. Returns the number of features.
+    """
+    counts = [parse_fire_count(props) for props in properties]
+    counts = [np.nan if c is None else c for c in counts]
+    geobundle.write_bundle(bundle_path, geometries, properties, arrays={"fire_count": counts})
+    return len(geometries)
+
+def write_fire_bundle(geojson_path, bundle_path):
+    """
+    Preprocess a fire GeoJSON into the compact bundle format read at startup.
+    """
+    geometries, properties, _ = extract_features(load_geojson(geojson_path))
+    count = write_features_bundle(geometries, properties, bundle_path)
+    print(f"✅ Wrote {bundle_path} with {count} features.")
+
+def load_fire_dataset(base_path):
+    """
+    Returns FireData(feature index, centroid index) for one period. Both share the same
+    geometry objects. A bundle's arrays (WKB, property columns, fire counts) are
+    memory-mapped read-only, so every worker reads them from the one page-cache copy
+    and property rows are only built on lookup.
+    The index records are {"properties": {...}} mappings, like GeoJSON features.
+    """
+    bundle_path = base_path + ".bundle"
+    if not os.path.isdir(bundle_path):
+        geometries, properties, fire_counts = extract_features(load_geojson(base_path + ".geojson"))
+        polys = list(zip(geometries, fire_counts))
+        index = PolygonIndex(geometries, [{"properties": p} for p in properties])
+        return FireData(index, build_centroid_index(polys))
+
+    bundle = geobundle.read_bundle(bundle_path, mmap=True)
+    geometries = bundle.geometries
+    counts = bundle.arrays["fire_count"]
+    index = PolygonIndex(geometries, geobundle.PropertyRows(bundle))
+
+    valid = np.flatnonzero(bundle.valid)
+    centroids = CentroidIndex(
+        geometries[valid],
+        np.nan_to_num(counts[valid], nan=0.0),
+        projected_crs=bundle.projected_crs,
+        centroids=(bundle.centroids[valid, 0], bundle.centroids[valid, 1]),
+    )
+    return FireData(index, centroids)
+
+def get(period):
+    """
+    Loaded FireData for "9605" or "0615"; raises datasets.DatasetNotReady while it is still loading.
+    """
+    return datasets.get(f"fire_{period}")
+
 
+# === Registered for parallel loading at startup ===
+for _period, _base_path in FIRE_DATASETS.items():
+    datasets.register(
+        f"fire_{_period}",
+        lambda base_path=_base_path: load_fire_dataset(base_path),
+        sources=(_base_path + ".bundle", _base_path + ".geojson"),
+    )
 
-# === Load at startup ===
-geojson_9605 = load_geojson("data/fire_1996_2005.geojson")
-geojson_0615 = load_geojson("data/fire_2006_2015.geojson")
 
-polys_9605 = extract_polygons_and_values(geojson_9605)
-polys_0615 = extract_polygons_and_values(geojson_0615)
+if __name__ == "__main__":
+    # Preprocess the GeoJSON files into bundles
+    for base_path in FIRE_DATASETS.values():
+        write_fire_bundle(base_path + ".geojson", base_path + ".bundle")
@@ -0,0 +1,188 @@
+import gc
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# === Dataset registry ===
+# Each dataset module registers a loader instead of loading at import. Loaders
+# run in parallel on a thread pool (start_loading), or on first use (get), and
+# their state and timing is reported by status() for the /ready probe.
+# version() identifies the files a dataset was loaded from, so results derived
+# from it (see result_cache) can be told apart from those of another build.
+DATASET_WAIT_TIMEOUT = float(os.getenv("DATASET_WAIT_TIMEOUT", "0"))  # seconds a request waits for a loading dataset
+DATASET_RETRY_BACKOFF = float(os.getenv("DATASET_RETRY_BACKOFF", "30"))  # seconds before a failed dataset is retried
+DATASET_RETRY_MAX_BACKOFF = float(os.getenv("DATASET_RETRY_MAX_BACKOFF", "1800"))  # doubling stops here
+
+
+class DatasetNotReady(Exception):
+    def __init__(self, name, state):
+        super().__init__(f"Dataset {name} is {state}")
+        self.name = name
+        self.state = state
+
+
+_lock = threading.Lock()
+_loaders = {}
+_values = {}
+_status = {}
+_done = {}
+_retry_at = {}  # name -> time before which a failed dataset is not reloaded on demand
+_executor = None
+_executor_pid = None
+
+
+_sources = {}
+
+
+def register(name, loader, sources=()):
+    """
+    `sources` are the files or directories the loader reads; their sizes and
+    modification times make up the dataset's version.
+    """
+    with _lock:
+        _loaders[name] = loader
+        _sources[name] = tuple(sources)
+        _status[name] = {"state": "pending", "seconds": None, "error": None, "version": None, "failures": 0}
+        _done[name] = threading.Event()
+
+
+def file_version(paths):
+    """
+    Short hash of the size and mtime of every file under `paths` (missing ones are skipped).
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+        else:
+            files = [path] if os.path.exists(path) else []
+        for filename in files:
+            stat = os.stat(filename)
+            digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _load(name):
+    with _lock:
+        if _status[name]["state"] != "queued":
+            return
+        _status[name]["state"] = "loading"
+    start = time.time()
+    try:
+        version = file_version(_sources[name])
+        value = _loaders[name]()
+        with _lock:
+            _values[name] = value
+            _status[name].update(state="ready", seconds=round(time.time() - start, 3), version=version, failures=0)
+        print(f"✅ Dataset {name} loaded in {time.time() - start:.2f}s")
+    except Exception as e:
+        with _lock:
+            failures = _status[name]["failures"] + 1
+            _status[name].update(state="failed", seconds=round(time.time() - start, 3), error=str(e), failures=failures)
+            backoff = min(DATASET_RETRY_BACKOFF * 2 ** (failures - 1), DATASET_RETRY_MAX_BACKOFF)
+            _retry_at[name] = time.time() + backoff
+        print(f"⚠️ Dataset {name} failed to load: {e} (retried on demand after {backoff:.0f}s)")
+    finally:
+        _done[name].set()
+
+
+def start_loading(names=None, retry=False):
+    """
+    Queue the given (default: all) datasets for loading in parallel. Non-blocking.
+    The pool has one thread per dataset, so loaders may wait on each other via get().
+    A failed dataset is queued again once its backoff has passed, or at once with `retry`.
+    """
+    global _executor, _executor_pid
+    with _lock:
+        # A pool inherited through fork has no threads behind it; make a fresh one
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max(len(_loaders), 1), thread_name_prefix="dataset")
+            _executor_pid = os.getpid()
+        queued = []
+        for name in names or list(_loaders):
+            state = _status[name]["state"]
+            if state == "failed" and not retry and time.time() < _retry_at.get(name, 0):
+                continue
+            if state in ("pending", "failed"):
+                _status[name].update(state="queued", error=None)
+                _done[name].clear()  # set again when this attempt finishes
+                queued.append(name)
+    for name in queued:
+        _executor.submit(_load, name)
+
+
+def wait_all(timeout=None):
+    deadline = None if timeout is None else time.time() + timeout
+    for event in list(_done.values()):
+        remaining = None if deadline is None else max(deadline - time.time(), 0)
+        event.wait(remaining)
+    return all_ready()
+
+
+def preload():
+    """
+    Load everything in this process and freeze it for sharing with forked workers
+    (gunicorn preload_app, see gunicorn.conf.py). Loaded objects are moved out of
+    the garbage collector's reach so collections in the workers do not write to,
+    and thereby copy, every page they share with the parent. Pages a worker
+    touches through reference counting are still copied.
+    """
+    global _executor
+    start_loading()
+    wait_all()
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Preloaded {sum(1 for n in _loaders if n in _values)}/{len(_loaders)} datasets for forked workers")
+
+
+def get(name, timeout=None):
+    """
+    The loaded value of `name`. Starts loading it if nobody has, then waits up to
+    `timeout` seconds (default DATASET_WAIT_TIMEOUT); raises DatasetNotReady otherwise.
+    """
+    value = _values.get(name)
+    if value is not None:
+        return value
+
+    start_loading([name])
+    _done[name].wait(DATASET_WAIT_TIMEOUT if timeout is None else timeout)
+    if name not in _values:
+        raise DatasetNotReady(name, _status[name]["state"])
+    return _values[name]
+
+
+def load(name):
+    """
+    Blocking get(), for loaders that build on another dataset and for offline scripts.
+    """
+    start_loading([name])
+    _done[name].wait()
+    if name not in _values:
+        raise DatasetNotReady(name, _status[name]["state"])
+    return _values[name]
+
+
+def is_ready(name):
+    return name in _values
+
+
+def version(name):
+    """
+    Version of the loaded `name`, or None while it is not loaded.
+    """
+    return _status[name]["version"] if name in _values else None
+
+
+def all_ready():
+    return all(name in _values for name in _loaders)
+
+
+def status():
+    with _lock:
+        return {name: dict(info) for name, info in _status.items()}
@@ -0,0 +1,185 @@
+import argparse
+import itertools
+import json
+import math
+import os
+
+import numpy as np
+
+import datasets
+from utils import get_transformer
+
+# === Local fluvial flood depth rasters ===
+# `python fluvial_rasters.py ingest --period 100 grid1.tif grid2.asc ...` turns
+# downloaded T10/T100/T500 depth grids into tiled float32 arrays under
+# FLUVIAL_RASTER_DIR/<period>/. They are memory-mapped at startup so a lookup
+# is an index computation and a page read instead of a WMS round-trip.
+FLUVIAL_RASTER_DIR = os.getenv("FLUVIAL_RASTER_DIR", "data/fluvial")
+TILE_SIZE = 256
+PERIODS = ("10", "100", "500")
+
+ASCII_GRID_KEYS = {"ncols", "nrows", "xllcorner", "yllcorner", "xllcenter", "yllcenter", "cellsize", "nodata_value"}
+
+rasters = {period: [] for period in PERIODS}
+version = None  # datasets.file_version of the mapped grids
+
+
+# --- Reading source grids ---
+def read_ascii_grid(path):
+    """
+    ESRI ASCII grid -> (array, origin_x, origin_y, pixel_size, nodata), origin at the top-left corner.
+    """
+    header = {}
+    with open(path, "r", encoding="utf-8") as f:
+        # Header lines come first, in any order; NODATA_value is optional
+        line = f.readline()
+        while line.split() and line.split()[0].lower() in ASCII_GRID_KEYS:
+            key, value = line.split()
+            header[key.lower()] = float(value)
+            line = f.readline()
+        data = np.loadtxt(itertools.chain([line], f), dtype=np.float32, ndmin=2)
+
+    size = header["cellsize"]
+    nrows = int(header["nrows"])
+    left = header.get("xllcorner", header.get("xllcenter", 0) - size / 2)
+    bottom = header.get("yllcorner", header.get("yllcenter", 0) - size / 2)
+    return data, left, bottom + nrows * size, size, header.get("nodata_value")
+
+
+def read_geotiff(path):
+    """
+    Single-band GeoTIFF -> (array, origin_x, origin_y, pixel_size, nodata), using the
+    ModelPixelScale / ModelTiepoint tags. The CRS is not read; pass it to ingest.
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(path) as image:
+        tags = image.tag_v2
+        data = np.asarray(image, dtype=np.float32)
+        scale_x, scale_y = tags[33550][:2]
+        _, _, _, tie_x, tie_y, _ = tags[33922][:6]
+        nodata = tags.get(42113)
+    if scale_x != scale_y:
+        raise ValueError(f"{path}: non-square pixels ({scale_x} x {scale_y}) are not supported")
+    return data, tie_x, tie_y, scale_x, float(nodata) if nodata not in (None, "") else None
+
+
+def read_grid(path):
+    if path.lower().endswith(".asc"):
+        return read_ascii_grid(path)
+    return read_geotiff(path)
+
+
+# --- Tiled storage ---
+def to_tiles(data, tile=TILE_SIZE):
+    rows, cols = data.shape
+    tiles_y, tiles_x = math.ceil(rows / tile), math.ceil(cols / tile)
+    padded = np.full((tiles_y * tile, tiles_x * tile), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = data
+    return padded.reshape(tiles_y, tile, tiles_x, tile).transpose(0, 2, 1, 3)
+
+
+def ingest(period, paths, crs="EPSG:25830", directory=FLUVIAL_RASTER_DIR):
+    if period not in PERIODS:
+        raise ValueError(f"Unknown return period {period}; expected one of {PERIODS}")
+    out_dir = os.path.join(directory, period)
+    os.makedirs(out_dir, exist_ok=True)
+
+    for path in paths:
+        data, origin_x, origin_y, pixel_size, nodata = read_grid(path)
+        if nodata is not None:
+            data[data == nodata] = np.nan
+        data[data < -1e+38] = np.nan
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        tiles = to_tiles(data)
+        np.save(os.path.join(out_dir, f"{name}.npy"), tiles)
+        meta = {
+            "crs": crs,
+            "origin_x": origin_x,
+            "origin_y": origin_y,
+            "pixel_size": pixel_size,
+            "width": int(data.shape[1]),
+            "height": int(data.shape[0]),
+            "tile": TILE_SIZE,
+        }
+        with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        print(f"✅ Ingested {path} as T{period} grid {name} ({data.shape[1]}x{data.shape[0]})")
+
+
+def load_rasters(directory=FLUVIAL_RASTER_DIR):
+    """
+    Memory-map every ingested grid. Periods without grids simply fall back to WMS.
+    """
+    global version
+    version = datasets.file_version([directory])
+    for period in PERIODS:
+        rasters[period] = []
+        period_dir = os.path.join(directory, period)
+        if not os.path.isdir(period_dir):
+            continue
+        for filename in sorted(os.listdir(period_dir)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(period_dir, filename), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["tiles"] = np.load(os.path.join(period_dir, filename[:-5] + ".npy"), mmap_mode="r")
+            rasters[period].append(meta)
+    return rasters
+
+
+# --- Sampling ---
+def sample_many(period, lats, lons):
+    """
+    Depth at each point for one return period, vectorized.
+    Points outside every grid are NaN; points inside a grid but without flooding are 0.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    values = np.full(lats.shape, np.nan)
+    pending = np.ones(lats.shape, dtype=bool)
+
+    for grid in rasters[period]:
+        if not pending.any():
+            break
+        x, y = get_transformer("EPSG:4326", grid["crs"]).transform(lons[pending], lats[pending])
+        col = np.floor((np.asarray(x) - grid["origin_x"]) / grid["pixel_size"]).astype(np.int64)
+        row = np.floor((grid["origin_y"] - np.asarray(y)) / grid["pixel_size"]).astype(np.int64)
+        inside = (col >= 0) & (col < grid["width"]) & (row >= 0) & (row < grid["height"])
+        if not inside.any():
+            continue
+
+        tile = grid["tile"]
+        r, c = row[inside], col[inside]
+        depth = np.asarray(grid["tiles"][r // tile, c // tile, r % tile, c % tile], dtype=float)
+
+        targets = np.flatnonzero(pending)[inside]
+        values[targets] = np.where(np.isnan(depth), 0.0, depth)
+        pending[targets] = False
+
+    return values
+
+
+def sample(period, lat, lon):
+    """
+    Depth at one point, or None when no local grid covers it.
+    """
+    if not rasters[period]:
+        return None
+    value = sample_many(period, [lat], [lon])[0]
+    return None if np.isnan(value) else float(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest fluvial flood depth grids for local sampling.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Convert GeoTIFF / ESRI ASCII depth grids")
+    ingest_parser.add_argument("--period", required=True, choices=PERIODS)
+    ingest_parser.add_argument("--crs", default="EPSG:25830", help="CRS of the source grids")
+    ingest_parser.add_argument("--out", default=FLUVIAL_RASTER_DIR)
+    ingest_parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    ingest(args.period, args.paths, crs=args.crs, directory=args.out)
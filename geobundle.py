@@ -0,0 +1,166 @@
+import json
+import os
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+# === Compact on-disk polygon datasets ===
+# A bundle is a directory of plain .npy arrays plus a small JSON manifest:
+#   wkb.npy / wkb_offsets.npy   geometries as one WKB byte buffer (EPSG:4326)
+#   centroids.npy               (N, 2) centroids of the projected polygons
+#   valid.npy                   polygonal and valid, per feature
+#   array_<name>.npy            numeric per-feature columns (e.g. parsed fire counts)
+#   column_<i>.npy / _mask.npy  properties column by column, each value JSON-encoded
+#                               so numbers, booleans and nulls read back as such
+# Loading is a handful of np.load calls and one vectorized shapely.from_wkb,
+# instead of json.load and a shape() per feature.
+PROJECTED_CRS = "EPSG:25830"
+
+
+def _encode_value(value):
+    # NumPy scalars (from GeoDataFrames) as plain Python values, NaN as null
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        value = None
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def write_bundle(path, geometries, properties=None, arrays=None, projected_crs=PROJECTED_CRS):
+    """
+    Write polygons (EPSG:4326), their properties and numeric arrays as a bundle directory.
+    """
+    os.makedirs(path, exist_ok=True)
+    geometries = np.asarray(geometries, dtype=object)
+    properties = properties or [{} for _ in geometries]
+    arrays = arrays or {}
+
+    wkb = shapely.to_wkb(geometries)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in wkb])
+    np.save(os.path.join(path, "wkb.npy"), np.frombuffer(b"".join(wkb), dtype=np.uint8))
+    np.save(os.path.join(path, "wkb_offsets.npy"), offsets)
+
+    centroids = gpd.GeoSeries(geometries, crs="EPSG:4326").to_crs(projected_crs).centroid
+    np.save(os.path.join(path, "centroids.npy"), np.column_stack([centroids.x.to_numpy(), centroids.y.to_numpy()]))
+
+    polygonal = np.isin(shapely.get_type_id(geometries), [3, 6])  # Polygon, MultiPolygon
+    np.save(os.path.join(path, "valid.npy"), polygonal & shapely.is_valid(geometries))
+
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f"array_{name}.npy"), np.asarray(values, dtype=float))
+
+    # Column order follows first appearance, so rows rebuild with their original key order
+    columns = list(dict.fromkeys(key for props in properties for key in props))
+    for i, column in enumerate(columns):
+        present = np.array([column in props for props in properties], dtype=bool)
+        values = np.array([_encode_value(props.get(column)) for props in properties], dtype=str)
+        np.save(os.path.join(path, f"column_{i}.npy"), values)
+        np.save(os.path.join(path, f"column_{i}_mask.npy"), present)
+
+    manifest = {
+        "count": len(geometries),
+        "crs": "EPSG:4326",
+        "projected_crs": projected_crs,
+        "columns": columns,
+        "values": "json",
+        "arrays": list(arrays),
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def write_frame(path, gdf, numeric=(), projected_crs=PROJECTED_CRS):
+    """
+    Write a GeoDataFrame as a bundle: non-empty geometries reprojected to EPSG:4326,
+    every column as a property and the `numeric` columns also as float arrays.
+    Returns the number of features written.
+    """
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+
+    columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    properties = [{c: v for c, v in zip(columns, row) if v is not None} for row in gdf[columns].itertuples(index=False)]
+    arrays = {name: gdf[name].astype(float).to_numpy() for name in numeric if name in gdf.columns}
+    write_bundle(path, gdf.geometry.to_numpy(), properties, arrays=arrays, projected_crs=projected_crs)
+    return len(gdf)
+
+
+class GeoBundle:
+    """
+    A loaded bundle. Arrays are plain (or memory-mapped) NumPy arrays;
+    `geometries` are decoded from WKB on first access.
+    """
+
+    def __init__(self, path, mmap=False):
+        mode = "r" if mmap else None
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode=mode)
+
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.path = path
+        self.projected_crs = self.manifest["projected_crs"]
+        self.wkb = load("wkb.npy")
+        self.wkb_offsets = load("wkb_offsets.npy")
+        self.centroids = load("centroids.npy")
+        self.valid = load("valid.npy")
+        self.arrays = {name: load(f"array_{name}.npy") for name in self.manifest["arrays"]}
+        self.columns = [
+            (name, load(f"column_{i}.npy"), load(f"column_{i}_mask.npy"))
+            for i, name in enumerate(self.manifest["columns"])
+        ]
+        # Bundles written before values were JSON-encoded hold plain strings
+        self._decode = json.loads if self.manifest.get("values") == "json" else str
+        self._geometries = None
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def wkb_at(self, positions):
+        offsets = self.wkb_offsets
+        return [self.wkb[offsets[i]:offsets[i + 1]].tobytes() for i in positions]
+
+    def geometries_at(self, positions):
+        return shapely.from_wkb(self.wkb_at(positions))
+
+    @property
+    def geometries(self):
+        if self._geometries is None:
+            self._geometries = self.geometries_at(range(len(self)))
+        return self._geometries
+
+    def properties(self, i):
+        return {name: self._decode(values[i]) for name, values, present in self.columns if present[i]}
+
+    def row(self, i):
+        """
+        properties(i) with the numeric arrays of feature i as floats (missing values left out).
+        """
+        row = self.properties(i)
+        for name, values in self.arrays.items():
+            if not np.isnan(values[i]):
+                row[name] = float(values[i])
+        return row
+
+
+class PropertyRows:
+    """
+    Sequence view that builds GeoJSON-like {"properties": {...}} records on
+    demand, so indexes over a bundle do not hold one dict per feature.
+    """
+
+    def __init__(self, bundle, positions=None):
+        self.bundle = bundle
+        self.positions = np.arange(len(bundle)) if positions is None else np.asarray(positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        return {"properties": self.bundle.properties(int(self.positions[i]))}
+
+
+def read_bundle(path, mmap=False):
+    return GeoBundle(path, mmap=mmap)
@@ -0,0 +1,23 @@
+import multiprocessing
+import os
+
+# === Production server ===
+# gunicorn -c gunicorn.conf.py main:app
+#
+# The app is imported and every dataset loaded once in the master process,
+# then workers are forked from it instead of each loading its own
+# GeoJSON/shapefile copies. Python and GEOS objects are only shared until a
+# worker touches them (refcounts write to their pages); the numeric arrays of
+# fire bundles are memory-mapped, so those stay a single page-cache copy.
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GEODATA_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker is forked
+    if preload_app:
+        import datasets
+        datasets.preload()
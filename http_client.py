@@ -0,0 +1,99 @@
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+import wms_cache
+
+# === Shared upstream HTTP client ===
+# One pooled, keep-alive client per worker, opened on startup and shared by
+# every WMS provider so lookups reuse TCP/TLS connections.
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+client = None
+_host_slots = {}
+
+
+async def start():
+    global client
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+async def close():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+def _host_slot(url):
+    # httpx only limits the pool as a whole; cap concurrent requests per host
+    # so one slow upstream cannot take every pooled connection.
+    host = urlsplit(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST)
+    return slot
+
+
+async def get(url, params=None, timeout=None):
+    """
+    GET through the shared pool. `timeout` overrides the client default for this call.
+    Raises httpx.HTTPError on transport errors and non-2xx responses.
+    """
+    if client is None:
+        await start()
+    host = urlsplit(url).hostname  # no port: Server-Timing names are tokens
+    outcome = "error"
+    try:
+        async with _host_slot(url):
+            with metrics.span(f"upstream.{host}"):
+                response = await client.get(
+                    url,
+                    params=params,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                )
+        response.raise_for_status()
+        outcome = "ok"
+        return response
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"  # the caller's deadline ran out first
+        raise
+    finally:
+        metrics.inc("envrisk_upstream_requests_total", host=host, outcome=outcome)
+
+
+async def get_feature_info(layer, lat, lon, url, params=None, parse=None, timeout=None, ttl=None):
+    """
+    WMS GetFeatureInfo answer for `layer` at (lat, lon), served from wms_cache
+    when the snapped cell has a fresh entry. `parse` turns the body into the
+    returned value; a body it rejects (raises on) is never cached. The SQLite
+    cache is read and written in a worker thread, off the event loop.
+    """
+    parse = parse or (lambda body: body)
+    body = await asyncio.to_thread(wms_cache.get, layer, lat, lon, ttl=ttl)
+    metrics.cache("wms", body is not None)
+    if body is not None:
+        return parse(body)
+    response = await get(url, params=params, timeout=timeout)
+    body = response.text
+    value = parse(body)
+    await asyncio.to_thread(wms_cache.put, layer, lat, lon, body)
+    return value
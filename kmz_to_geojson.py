@@ -1,10 +1,18 @@
+import argparse
 import zipfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from shapely.geometry import Polygon, mapping
 from shapely.validation import explain_validity
-from bs4 import BeautifulSoup
 from html import unescape
 import json
+import os
+import re
+
+import data_load_fire
+
+KML_NS = "{http://www.opengis.net/kml/2.2}"
+CHUNK_SIZE = 256  # placemarks per worker task
 
 def parse_coordinates(coord_text):
     coords = []
@@ -15,43 +23,48 @@ def parse_coordinates(coord_text):
             coords.append((lon, lat))
     return coords
 
+_ROW = re.compile(r"<tr[^>]*>(.*?)</tr>", re.S | re.I)
+_CELL = re.compile(r"<td[^>]*>(.*?)</td>", re.S | re.I)
+_TAG = re.compile(r"<[^>]+>")
+
+def _cell_text(cell):
+    # Same as BeautifulSoup's get_text(strip=True): decode the entities still in
+    # each text run (&aacute;, &#209;, &nbsp;...), strip it and join
+    return "".join(unescape(part).strip() for part in _TAG.split(cell))
+
 def extract_description_data(description_html):
     """
     Parses the HTML in a KML <description> field and extracts structured fire risk info.
-    Returns a dictionary of values.
+    Returns a dictionary of values from the two-cell rows of the nested data table.
     """
-    soup = BeautifulSoup(unescape(description_html), "html.parser")
     result = {}
-
-    try:
-        inner_table = soup.find("table").find("table")  # Get the nested table
-        for row in inner_table.find_all("tr"):
-            cells = row.find_all("td")
-            if len(cells) != 2:
-                continue
-            key = cells[0].get_text(strip=True).strip(":")
-            value = cells[1].get_text(strip=True)
-            result[key] = value
-    except Exception as e:
-        print(f"⚠️ Error parsing description: {e}")
+    if not description_html:
+        return result
+
+    html = unescape(description_html)
+    outer = html.lower().find("<table")
+    inner = html.lower().find("<table", outer + 1) if outer >= 0 else -1
+    if inner < 0:
+        print("⚠️ Error parsing description: no nested data table")
+        return result
+
+    end = html.lower().find("</table>", inner)
+    for row in _ROW.findall(html[inner:end if end >= 0 else None]):
+        cells = _CELL.findall(row)
+        if len(cells) != 2:
+            continue
+        key = _cell_text(cells[0]).strip(":")
+        result[key] = _cell_text(cells[1])
     return result
 
-def extract_polygons(placemark_elem):
-    ns = {"kml": "http://www.opengis.net/kml/2.2"}
+def build_polygons(rings):
+    """
+    Polygons from [(outer coordinate text, [hole coordinate texts]), ...], repairing invalid ones with buffer(0).
+    """
     polygons = []
-
-    polygon_elems = placemark_elem.findall(".//kml:Polygon", ns)
-    for idx, polygon in enumerate(polygon_elems):
-        outer = polygon.find(".//kml:outerBoundaryIs/kml:LinearRing/kml:coordinates", ns)
-        if outer is None:
-            continue
-
-        outer_coords = parse_coordinates(outer.text)
-        inner_rings = polygon.findall(".//kml:innerBoundaryIs/kml:LinearRing/kml:coordinates", ns)
-        holes = [parse_coordinates(inner.text) for inner in inner_rings]
-
+    for idx, (outer, holes) in enumerate(rings):
         try:
-            poly = Polygon(outer_coords, holes)
+            poly = Polygon(parse_coordinates(outer), [parse_coordinates(h) for h in holes])
             if not poly.is_valid:
                 poly = poly.buffer(0)  # Attempt repair
             if poly.is_valid:
@@ -62,49 +75,122 @@ def extract_polygons(placemark_elem):
             print(f"⚠️ Error creating polygon {idx}: {e}")
     return polygons
 
-def kmz_to_geojson(kmz_path, output_path):
-    ns = {"kml": "http://www.opengis.net/kml/2.2"}
+def convert_placemarks(placemarks):
+    """
+    Worker task: [(rings, description), ...] -> [(polygon, properties), ...].
+    """
     features = []
+    for rings, description in placemarks:
+        props = extract_description_data(description)
+        for poly in build_polygons(rings):
+            features.append((poly, props))
+    return features
 
+def iter_placemarks(kml_file):
+    """
+    Stream (rings, description) for each Placemark without building the whole tree.
+    Finished placemarks are detached from their parent so memory stays bounded.
+    """
+    stack = []
+    for event, elem in ET.iterparse(kml_file, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag != KML_NS + "Placemark":
+            continue
+
+        rings = []
+        for polygon in elem.iter(KML_NS + "Polygon"):
+            outer = polygon.find(f".//{KML_NS}outerBoundaryIs/{KML_NS}LinearRing/{KML_NS}coordinates")
+            if outer is None or not outer.text:
+                continue
+            holes = [
+                inner.text for inner in polygon.findall(f".//{KML_NS}innerBoundaryIs/{KML_NS}LinearRing/{KML_NS}coordinates")
+                if inner.text
+            ]
+            rings.append((outer.text, holes))
+        description = elem.findtext(KML_NS + "description")
+
+        yield rings, description
+
+        if stack:
+            stack[-1].remove(elem)
+
+def iter_chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_features(kmz_path, workers=None):
+    """
+    Yield (polygon, properties) in file order, building polygons in a process pool.
+    At most `2 * workers` chunks are in flight at once.
+    """
+    workers = workers or os.cpu_count() or 1
     with zipfile.ZipFile(kmz_path, 'r') as z:
         kml_filename = next((f for f in z.namelist() if f.endswith('.kml')), None)
         if not kml_filename:
             raise ValueError("No .kml file found in KMZ")
 
-        with z.open(kml_filename) as f:
-            tree = ET.parse(f)
-            root = tree.getroot()
-
-            for placemark in root.findall(".//kml:Placemark", ns):
-                polygons = extract_polygons(placemark)
-                desc_elem = placemark.find("kml:description", ns)
-                props = extract_description_data(desc_elem.text) if desc_elem is not None else {}
-
-                for poly in polygons:
-                    features.append({
-                        "type": "Feature",
-                        "geometry": mapping(poly),
-                        "properties": props
-                    })
-
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-
+        with z.open(kml_filename) as f, ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in iter_chunks(iter_placemarks(f), CHUNK_SIZE):
+                pending.append(pool.submit(convert_placemarks, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.pop(0).result()
+            for future in pending:
+                yield from future.result()
+
+def write_geojson(features, output_path):
+    count = 0
     with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(geojson, f, ensure_ascii=False, indent=2)
-
-    print(f"✅ Exported GeoJSON to {output_path} with {len(features)} features.")
+        f.write('{"type":"FeatureCollection","features":[')
+        for poly, props in features:
+            if count:
+                f.write(",")
+            json.dump({"type": "Feature", "geometry": mapping(poly), "properties": props},
+                      f, ensure_ascii=False, separators=(",", ":"))
+            count += 1
+        f.write("]}")
+    return count
+
+def write_fire_bundle(features, output_path):
+    geometries = []
+    properties = []
+    for poly, props in features:
+        geometries.append(poly)
+        properties.append(props)
+    return data_load_fire.write_features_bundle(geometries, properties, output_path)
+
+def kmz_to_geojson(kmz_path, output_path, output_format="geojson", workers=None):
+    features = iter_features(kmz_path, workers=workers)
+    if output_format == "bundle":
+        count = write_fire_bundle(features, output_path)
+    else:
+        count = write_geojson(features, output_path)
+
+    print(f"✅ Exported {output_format} to {output_path} with {count} features.")
 
 
 if __name__ == "__main__":
-    # === Adjust paths as needed
-    kmz_to_geojson(
-        "data/frecuenciadeincendiosperiodo1996a2005_tcm30-199965.kmz",
-        "data/fire_1996_2005.geojson"
-    )
-    kmz_to_geojson(
-        "data/frecuenciadeincendiosperiodo2006a2015_tcm30-525840.kmz",
-        "data/fire_2006_2015.geojson"
-    )
+    parser = argparse.ArgumentParser(description="Convert MITECO fire-frequency KMZ files.")
+    parser.add_argument("--format", choices=["geojson", "bundle"], default="geojson")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("paths", nargs="*", help="input.kmz output pairs")
+    args = parser.parse_args()
+
+    # === Default: the two fire-frequency periods
+    pairs = list(zip(args.paths[::2], args.paths[1::2])) or [
+        ("data/frecuenciadeincendiosperiodo1996a2005_tcm30-199965.kmz", "data/fire_1996_2005"),
+        ("data/frecuenciadeincendiosperiodo2006a2015_tcm30-525840.kmz", "data/fire_2006_2015"),
+    ]
+    for kmz_path, output_path in pairs:
+        if not args.paths:
+            output_path += ".bundle" if args.format == "bundle" else ".geojson"
+        kmz_to_geojson(kmz_path, output_path, output_format=args.format, workers=args.workers)
@@ -1,22 +1,36 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware 
-from fastapi.responses import JSONResponse
-from auth import verify_token
+from fastapi.responses import JSONResponse, PlainTextResponse
+from auth import verify_token, start_jwks_refresh, stop_jwks_refresh
 from fastapi import Depends
-from typing import Dict
+from typing import Dict, List, Optional
 import requests
 from xml.etree import ElementTree as ET
 import time
 import logging
+import asyncio
+import hashlib
+import os
 
+import http_client
+import metrics
+import result_cache
+import basemap
+import fluvial_rasters
+import wms_cache
 import risk_fluvial_flood
 import risk_coastal_flood
+import risk_coastal_map
+import tile_cache
+import vector_tiles
 import risk_fire
 import risk_desert
 import risk_seismic
+import datasets
 import data_load_fire
 import data_load_desert
+from utils import IMAGE_FORMATS, encode_image
 
 # Optional: configure logging if not already set
 logging.basicConfig(level=logging.INFO)
@@ -41,24 +55,109 @@ class RiskResult(BaseModel):
     fire: Dict
     desertification: Dict
     seismic: Dict
+    status: Dict[str, str]
+
+class BatchPoint(BaseModel):
+    lat: float
+    lon: float
+
+class BatchRequest(BaseModel):
+    points: List[BatchPoint]
+    hazards: Optional[List[str]] = None  # default: every hazard
+    images: bool = False
 
 def ensure_dict(data):
     return data if isinstance(data, dict) else {"error": str(data)}
 
+# === Instrumentation ===
+# Every response carries the stage timings recorded during the request (see
+# metrics.span) in a Server-Timing header; /metrics exposes the aggregates.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+@app.middleware("http")
+async def instrument(request, call_next):
+    timings, token = metrics.start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request(token)
+    total = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.observe(
+        "envrisk_request_seconds", total,
+        route=route.path if route is not None else "unmatched",
+        method=request.method,
+        status=str(response.status_code),
+    )
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus-style metrics for this worker process.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# === Shared upstream HTTP client ===
+@app.on_event("startup")
+async def open_http_client():
+    await http_client.start()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.close()
+
+# === Auth0 signing keys, fetched in the background ===
+@app.on_event("startup")
+def start_auth():
+    start_jwks_refresh()
+
+@app.on_event("shutdown")
+def stop_auth():
+    stop_jwks_refresh()
+
 # === Load data on startup ===
+# Fire and desertification datasets load in parallel in the background; /ready
+# reports their progress and hazards are served as soon as their own data is in.
+# Set DATASETS_WAIT_ON_STARTUP=1 to hold startup until everything is loaded.
+DATASETS_WAIT_ON_STARTUP = os.getenv("DATASETS_WAIT_ON_STARTUP", "0") == "1"
+
 @app.on_event("startup")
 def load_datasets():
-    # Fire datasets
-    _ = data_load_fire.geojson_9605
-    _ = data_load_fire.geojson_0615
-    _ = data_load_fire.polys_9605
-    _ = data_load_fire.polys_0615
-    print("✅ Fire datasets loaded into memory.")
-
-    # Desertification datasets
-    _ = data_load_desert.gdf
-    _ = data_load_desert.gdf2
-    print("✅ Desertification datasets loaded into memory.")
+    datasets.start_loading()
+    if DATASETS_WAIT_ON_STARTUP:
+        datasets.wait_all()
+        print("✅ Fire and desertification datasets loaded into memory.")
+
+    # Pre-rendered map rasters (built offline with `python basemap.py`)
+    if basemap.load_basemaps():
+        print(f"✅ Basemaps mapped: {', '.join(basemap.basemaps)}")
+
+    # Local fluvial depth grids (ingested offline with `python fluvial_rasters.py ingest`)
+    grids = fluvial_rasters.load_rasters()
+    if any(grids.values()):
+        print(f"✅ Fluvial depth grids mapped: {sum(len(g) for g in grids.values())}")
+
+@app.exception_handler(datasets.DatasetNotReady)
+def dataset_not_ready(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "dataset": exc.name, "state": exc.state},
+        headers={"Retry-After": "5"},
+    )
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: per-dataset load state and timing; 503 until every dataset is loaded.
+    """
+    return JSONResponse(
+        status_code=200 if datasets.all_ready() else 503,
+        content={"ready": datasets.all_ready(), "datasets": datasets.status()},
+    )
 
 # # === Combined Risk Endpoint ===
 # @app.get("/risk", response_model=RiskResult)
@@ -71,72 +170,389 @@ def load_datasets():
 #     }
 
 
+# === Provider fan-out ===
+# Each provider gets its own deadline; a slow upstream only costs its own slot.
+PROVIDERS = {
+    "fluvial_flood": (risk_fluvial_flood.run, "Fluvial flood"),
+    "coastal_flood": (risk_coastal_flood.run, "Coastal flood"),
+    "fire": (risk_fire.run, "Fire"),
+    "desertification": (risk_desert.run, "Desertification"),
+    "seismic": (risk_seismic.run, "Seismic"),
+}
+
+PROVIDER_TIMEOUTS = {
+    "fluvial_flood": float(os.getenv("FLUVIAL_FLOOD_TIMEOUT", "8")),
+    "coastal_flood": float(os.getenv("COASTAL_FLOOD_TIMEOUT", "8")),
+    "fire": float(os.getenv("FIRE_TIMEOUT", "10")),
+    "desertification": float(os.getenv("DESERTIFICATION_TIMEOUT", "10")),
+    "seismic": float(os.getenv("SEISMIC_TIMEOUT", "8")),
+}
+
+SEISMIC_LAYERS_HELP = (
+    f"Comma-separated IGN seismic layers, or 'all' (default: {', '.join(risk_seismic.DEFAULT_LAYERS)})."
+    f" Available: {', '.join(risk_seismic.LAYERS)}."
+)
+
+def parse_seismic_layers(value):
+    try:
+        return risk_seismic.parse_layers(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def call_provider(func, lat, lon, **kwargs):
+    if asyncio.iscoroutinefunction(func):
+        return await func(lat, lon, **kwargs)
+    return await asyncio.to_thread(func, lat, lon, **kwargs)
+
+async def run_provider(name, lat, lon, **kwargs):
+    """
+    Run one provider under its own deadline. WMS-backed providers are awaited
+    directly; CPU-bound ones run in a worker thread.
+    Returns (result_dict, status) where status is "ok", "error", "timeout" or
+    "loading" (its dataset has not finished loading yet).
+    """
+    func, label = PROVIDERS[name]
+    timeout = PROVIDER_TIMEOUTS[name]
+    with metrics.span(f"provider.{name}") as timing:
+        try:
+            result = await asyncio.wait_for(call_provider(func, lat, lon, **kwargs), timeout=timeout)
+            status = "ok" if isinstance(result, dict) and not result_cache.has_error(result) else "error"
+        except asyncio.TimeoutError:
+            result = f"{label} provider did not answer within {timeout:.1f}s"
+            status = "timeout"
+            logging.warning(f"{label} risk timed out after {timeout:.2f}s")
+        except datasets.DatasetNotReady as e:
+            result = str(e)
+            status = "loading"
+        except Exception as e:
+            result = f"{label} provider failed: {e}"
+            status = "error"
+            logging.exception(f"{label} risk failed")
+    metrics.inc("envrisk_provider_results_total", provider=name, status=status)
+    logging.info(f"{label} risk took {timing.seconds:.2f}s")
+    return ensure_dict(result), status
+
 
-@app.get("/risk", response_model=RiskResult, dependencies=[Depends(verify_token)])
-def get_risks(
+# verify_token is a parameter dependency here, so it is not repeated in dependencies=[...]
+@app.get("/risk", response_model=RiskResult)
+async def get_risks(
+    request: Request,
     lat: float = Query(...), 
     lon: float = Query(...),
+    images: bool = Query(True, description="Include base64 map images; false skips rendering entirely."),
+    layers: Optional[str] = Query(None, description=SEISMIC_LAYERS_HELP),
     token_data: dict = Depends(verify_token)
     ):
     print(f"Authenticated request by: {token_data['sub']}") # or 'email', or 'name'
-    start_total = time.time()
-
-    start = time.time()
-    fluvial = ensure_dict(risk_fluvial_flood.run(lat, lon))
-    logging.info(f"Fluvial flood risk took {time.time() - start:.2f}s")
+    seismic_layers = parse_seismic_layers(layers)
 
-    start = time.time()
-    coastal = ensure_dict(risk_coastal_flood.run(lat, lon))
-    logging.info(f"Coastal flood risk took {time.time() - start:.2f}s")
+    names = list(PROVIDERS)
+    options = {
+        "fire": {"images": images},
+        "desertification": {"images": images},
+        "seismic": {"layers": seismic_layers},
+    }
 
-    start = time.time()
-    fire = ensure_dict(risk_fire.run(lat, lon))
-    logging.info(f"Fire risk took {time.time() - start:.2f}s")
+    async def compute(lat, lon):
+        with metrics.span("providers") as timing:
+            outcomes = await asyncio.gather(*(run_provider(name, lat, lon, **options.get(name, {})) for name in names))
 
-    start = time.time()
-    desert = ensure_dict(risk_desert.run(lat, lon))
-    logging.info(f"Desertification risk took {time.time() - start:.2f}s")
+        logging.info(f"Total /risk endpoint processing time: {timing.seconds:.2f}s")
 
-    start = time.time()
-    seismic = ensure_dict(risk_seismic.run(lat, lon))
-    logging.info(f"Seismic risk took {time.time() - start:.2f}s")
+        response = {name: result for name, (result, _) in zip(names, outcomes)}
+        response["status"] = {name: status for name, (_, status) in zip(names, outcomes)}
+        return response
 
-    total_time = time.time() - start_total
-    logging.info(f"Total /risk endpoint processing time: {total_time:.2f}s")
-
-    return {
-        "fluvial_flood": fluvial,
-        "coastal_flood": coastal,
-        "fire": fire,
-        "desertification": desert,
-        "seismic": seismic,
-    }
+    # Only cache answers every provider gave in full
+    return await result_cache.serve(
+        request, "risk", names, lat, lon, compute,
+        cacheable=lambda response: all(status == "ok" for status in response["status"].values()),
+        ttl=risk_seismic.layers_ttl(seismic_layers),
+        images=images, layers=",".join(seismic_layers),
+    )
 
+# === Per-hazard endpoints ===
+# Served through result_cache like /risk: responses carry an ETag and
+# Cache-Control, and repeat points are answered from memory.
 @app.get("/risk/fire", dependencies=[Depends(verify_token)])
-def get_fire(lat: float, lon: float):
-    return {"fire": ensure_dict(risk_fire.run(lat, lon))}
+async def get_fire(request: Request, lat: float, lon: float, images: bool = True):
+    async def compute(lat, lon):
+        with metrics.span("provider.fire"):
+            return {"fire": ensure_dict(await asyncio.to_thread(risk_fire.run, lat, lon, images=images))}
+    return await result_cache.serve(request, "fire", ["fire"], lat, lon, compute, images=images)
 
 @app.get("/risk/flood", dependencies=[Depends(verify_token)])
-def get_flood(lat: float, lon: float):
-    return {
-        "fluvial_flood": ensure_dict(risk_fluvial_flood.run(lat, lon)),
-        "coastal_flood": ensure_dict(risk_coastal_flood.run(lat, lon)),
-    }
+async def get_flood(request: Request, lat: float, lon: float):
+    async def compute(lat, lon):
+        fluvial, coastal = await asyncio.gather(
+            metrics.timed("provider.fluvial_flood")(risk_fluvial_flood.run)(lat, lon),
+            metrics.timed("provider.coastal_flood")(risk_coastal_flood.run)(lat, lon),
+        )
+        return {
+            "fluvial_flood": ensure_dict(fluvial),
+            "coastal_flood": ensure_dict(coastal),
+        }
+    return await result_cache.serve(request, "flood", ["fluvial_flood", "coastal_flood"], lat, lon, compute)
 
 @app.get("/risk/desert", dependencies=[Depends(verify_token)])
-def get_desert(lat: float, lon: float):
-    return {"desertification": ensure_dict(risk_desert.run(lat, lon))}
+async def get_desert(request: Request, lat: float, lon: float, images: bool = True):
+    async def compute(lat, lon):
+        with metrics.span("provider.desertification"):
+            return {"desertification": ensure_dict(await asyncio.to_thread(risk_desert.run, lat, lon, images=images))}
+    return await result_cache.serve(request, "desert", ["desertification"], lat, lon, compute, images=images)
 
 @app.get("/risk/seismic", dependencies=[Depends(verify_token)])
-def get_seismic_risk(lat: float = Query(...), lon: float = Query(...)) -> Dict:
+async def get_seismic_risk(
+    request: Request,
+    lat: float = Query(...),
+    lon: float = Query(...),
+    layers: Optional[str] = Query(None, description=SEISMIC_LAYERS_HELP),
+) -> Dict:
+    seismic_layers = parse_seismic_layers(layers)
+
+    async def compute(lat, lon):
+        with metrics.span("provider.seismic"):
+            return {
+                "seismic": ensure_dict(await risk_seismic.run(lat, lon, layers=seismic_layers)),
+            }
+    return await result_cache.serve(
+        request, "seismic", ["seismic"], lat, lon, compute,
+        ttl=risk_seismic.layers_ttl(seismic_layers), layers=",".join(seismic_layers),
+    )
+
+# === Batch scoring ===
+# Fire and desertification are answered for the whole batch with vectorized
+# index queries, and fluvial flood with one sample of the local depth grids.
+# WMS-backed hazards are asked once per snapped cache cell, a bounded number
+# at a time.
+BATCH_PROVIDERS = {
+    "fire": risk_fire.run_batch,
+    "desertification": risk_desert.run_batch,
+}
+BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", "50000"))
+BATCH_UPSTREAM_CONCURRENCY = int(os.getenv("BATCH_UPSTREAM_CONCURRENCY", "16"))
+
+async def run_upstream_batch(func, points):
+    cells = {}
+    for i, (lat, lon) in enumerate(points):
+        cells.setdefault(wms_cache.cell(lat, lon), []).append(i)
+
+    slots = asyncio.Semaphore(BATCH_UPSTREAM_CONCURRENCY)
+
+    async def one(lat, lon):
+        async with slots:
+            try:
+                return ensure_dict(await func(lat, lon))
+            except datasets.DatasetNotReady:
+                raise  # the whole hazard reports "loading"
+            except Exception as e:
+                return {"error": str(e)}
+
+    groups = list(cells.values())
+    answers = await asyncio.gather(*(one(*points[group[0]]) for group in groups))
+
+    results = [None] * len(points)
+    for group, answer in zip(groups, answers):
+        for i in group:
+            results[i] = answer
+    return results
+
+async def run_fluvial_batch(points):
+    """
+    Sample the local depth grids for every point at once; only points they do
+    not fully cover go to IDEE, once per cell.
+    """
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    results = await asyncio.to_thread(risk_fluvial_flood.sample_batch, lats, lons)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        fetched = await run_upstream_batch(PROVIDERS["fluvial_flood"][0], [points[i] for i in missing])
+        for i, result in zip(missing, fetched):
+            results[i] = result
+    return results
+
+# Upstream hazards that answer what they can of a batch from local data first
+LOCAL_FIRST_BATCH_PROVIDERS = {
+    "fluvial_flood": run_fluvial_batch,
+}
+
+async def run_batch_provider(name, points, images):
+    _, label = PROVIDERS[name]
+    with metrics.span(f"batch.{name}") as timing:
+        try:
+            if name in BATCH_PROVIDERS:
+                lats = [lat for lat, _ in points]
+                lons = [lon for _, lon in points]
+                results = await asyncio.to_thread(BATCH_PROVIDERS[name], lats, lons, images=images)
+            elif name in LOCAL_FIRST_BATCH_PROVIDERS:
+                results = await LOCAL_FIRST_BATCH_PROVIDERS[name](points)
+            else:
+                results = await run_upstream_batch(PROVIDERS[name][0], points)
+            status = "ok"
+        except datasets.DatasetNotReady as e:
+            results = [{"error": str(e)}] * len(points)
+            status = "loading"
+        except Exception as e:
+            logging.exception(f"{label} batch failed")
+            results = [{"error": f"{label} provider failed: {e}"}] * len(points)
+            status = "error"
+    metrics.inc("envrisk_provider_results_total", provider=name, status=status)
+    logging.info(f"{label} batch of {len(points)} took {timing.seconds:.2f}s")
+    return results, status
+
+@app.post("/risk/batch")
+async def get_risks_batch(request: BatchRequest, token_data: dict = Depends(verify_token)):
+    hazards = request.hazards or list(PROVIDERS)
+    unknown = [h for h in hazards if h not in PROVIDERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown hazards: {', '.join(unknown)}")
+    if len(request.points) > BATCH_MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_POINTS} points per batch.")
+
+    print(f"Authenticated batch of {len(request.points)} points by: {token_data['sub']}")
+    start_total = time.time()
+
+    points = [(p.lat, p.lon) for p in request.points]
+    outcomes = await asyncio.gather(*(run_batch_provider(h, points, request.images) for h in hazards))
+
+    results = []
+    for i, (lat, lon) in enumerate(points):
+        row = {"lat": lat, "lon": lon}
+        for hazard, (hazard_results, _) in zip(hazards, outcomes):
+            row[hazard] = hazard_results[i]
+        results.append(row)
+
+    logging.info(f"Total /risk/batch processing time: {time.time() - start_total:.2f}s")
     return {
-        "seismic": ensure_dict(risk_seismic.run(lat, lon)),
+        "results": results,
+        "status": {hazard: status for hazard, (_, status) in zip(hazards, outcomes)},
     }
 
+# === Map images ===
+IMAGE_LAYERS = {
+    "fire_96_05": lambda lat, lon: risk_fire.render_map("fire_96_05", lat, lon),
+    "fire_06_15": lambda lat, lon: risk_fire.render_map("fire_06_15", lat, lon),
+    "desert": risk_desert.render_map,
+}
+IMAGE_LAYER_HAZARDS = {"fire_96_05": "fire", "fire_06_15": "fire", "desert": "desertification"}
+IMAGE_MAX_AGE = int(os.getenv("IMAGE_MAX_AGE", "86400"))
+
+def image_etag(layer, lat, lon, format):
+    """
+    ETag of an image from what it is drawn from, so a revalidation needs no rendering.
+    None while the layer's data is still loading.
+    """
+    version = result_cache.hazard_version(IMAGE_LAYER_HAZARDS[layer])
+    if version is None:
+        return None
+    key = f"{layer}|{lat!r}|{lon!r}|{format}|{version}"
+    return f'"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+@app.get("/risk/image/{layer}", dependencies=[Depends(verify_token)])
+def get_risk_image(request: Request, layer: str, lat: float, lon: float, format: str = "jpeg"):
+    """
+    Raw map image for one layer, for clients that asked /risk with images=false.
+    """
+    if layer not in IMAGE_LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown map layer: {layer}")
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {format}")
+
+    headers = {"Cache-Control": f"private, max-age={IMAGE_MAX_AGE}"}
+    etag = image_etag(layer, lat, lon, format)
+    if etag is not None:
+        headers["ETag"] = etag
+        if result_cache.etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+    image = IMAGE_LAYERS[layer](lat, lon)
+    if image is None:
+        raise HTTPException(status_code=404, detail="No map data for this location.")
+
+    with metrics.span("encode.image"):
+        content = encode_image(image, format)
+    return Response(content=content, media_type=IMAGE_FORMATS[format][1], headers=headers)
+
+# === Coastal flood map tiles ===
+# MITECO q100/q500 GetMap tiles through the disk tile cache, one at a time or
+# stitched around a point. Tiles are the same for every user.
+TILE_MAX_AGE = int(os.getenv("TILE_MAX_AGE", "86400"))
+
+def coastal_layer(period):
+    if period not in risk_coastal_map.LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown coastal layer: {period} (use {', '.join(risk_coastal_map.LAYERS)})")
+    return risk_coastal_map.LAYERS[period]
+
+@app.get("/coastal/tiles/{period}/{z}/{x}/{y}.png", dependencies=[Depends(verify_token)])
+async def get_coastal_tile(period: str, z: int, x: int, y: int):
+    layer = coastal_layer(period)
+    if not tile_cache.valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile out of range.")
+    try:
+        content = await risk_coastal_map.get_tile(layer, z, x, y)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"MITECO tile unavailable: {e}")
+    return Response(
+        content=content,
+        media_type="image/png",
+        headers={"Cache-Control": f"public, max-age={TILE_MAX_AGE}"},
+    )
+
+@app.get("/coastal/mosaic", dependencies=[Depends(verify_token)])
+async def get_coastal_mosaic(
+    lat: float,
+    lon: float,
+    period: str = "100",
+    zoom: int = Query(18, ge=0, le=risk_coastal_map.MAX_ZOOM),
+    radius: int = Query(1, ge=0, le=3, description="Tiles on each side of the point's tile."),
+    format: str = "png",
+):
+    """
+    One stitched image of the coastal flood tiles around the point. 502 when no
+    tile could be fetched; a partial mosaic is returned but must not be cached.
+    """
+    layer = coastal_layer(period)
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {format}")
+
+    image, failed = await risk_coastal_map.mosaic(layer, lat, lon, zoom, radius)
+    if failed == (2 * radius + 1) ** 2:
+        raise HTTPException(status_code=502, detail="MITECO tiles unavailable.")
+    with metrics.span("encode.mosaic"):
+        content = await asyncio.to_thread(encode_image, image, format)
+    if failed:
+        return Response(content=content, media_type=IMAGE_FORMATS[format][1], headers={"Cache-Control": "no-store"})
+    return Response(
+        content=content,
+        media_type=IMAGE_FORMATS[format][1],
+        headers={
+            "Cache-Control": f"public, max-age={TILE_MAX_AGE}",
+            "ETag": f'"{hashlib.sha1(content).hexdigest()}"',
+        },
+    )
+
+# === Vector tiles ===
+# Fire and desertification polygons as Mapbox Vector Tiles, for clients that
+# style the layers themselves instead of asking for rendered maps.
+@app.get("/tiles/{layer}/{z}/{x}/{y}.mvt", dependencies=[Depends(verify_token)])
+async def get_vector_tile(layer: str, z: int, x: int, y: int):
+    if layer not in vector_tiles.LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown vector tile layer: {layer}")
+    if not tile_cache.valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile out of range.")
+    content = await vector_tiles.get_tile(layer, z, x, y)
+    return Response(
+        content=content,
+        media_type=vector_tiles.MEDIA_TYPE,
+        headers={"Cache-Control": f"public, max-age={TILE_MAX_AGE}"},
+    )
+
 ## python -m venv venv
 # source venv/bin/activate  # or `venv\Scripts\activate` on Windows
 ## pip install -r requirements.txt
 # uvicorn main:app --reload
+# gunicorn -c gunicorn.conf.py main:app  # production: datasets loaded once and shared by all workers
 
 
 # test url
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# === Hot-path instrumentation ===
+# span("stage") times a block, feeds a per-stage latency histogram and, inside
+# a request, the Server-Timing header main.py adds to the response. Counters
+# track upstream failures and cache hits. Everything is per process: with
+# several gunicorn workers each one exposes its own /metrics.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}  # (name, labels) -> value
+_help = {}
+
+# Stage timings of the current request; child tasks and threads started with
+# asyncio.to_thread/anyio share the same list through the copied context.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        entry[bisect_left(BUCKETS, seconds)] += 1
+        entry[-1] += seconds
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def cache(name, hit):
+    """
+    Count a hit or miss for cache `name`; /metrics derives the hit ratio.
+    """
+    inc("envrisk_cache_requests_total", cache=name, result="hit" if hit else "miss")
+
+
+class Span:
+    __slots__ = ("name", "seconds")
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+
+
+@contextmanager
+def span(name):
+    """
+    Time the block as stage `name`. The yielded Span carries the duration once the block exits.
+    """
+    current = Span(name)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        observe("envrisk_stage_seconds", current.seconds, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, current.seconds))
+
+
+def timed(name):
+    """
+    Decorator form of span() for sync and async functions.
+    """
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# === Per-request collection ===
+def start_request():
+    timings = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token):
+    _request_timings.reset(token)
+
+
+def server_timing(timings, total=None):
+    """
+    Server-Timing header value. Repeated stages (e.g. several upstream calls)
+    are summed, with the call count in desc.
+    """
+    merged = {}
+    for name, seconds in timings:
+        total_s, calls = merged.get(name, (0.0, 0))
+        merged[name] = (total_s + seconds, calls + 1)
+
+    parts = []
+    for name, (seconds, calls) in merged.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if calls > 1:
+            part += f';desc="{calls} calls"'
+        parts.append(part)
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# === Exposition ===
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    with _lock:
+        histograms = {key: list(entry) for key, entry in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), entry in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), entry[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {entry[-1]:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    # Hit ratio per cache, derived from the request counters
+    caches = {}
+    for (name, labels), value in counters.items():
+        if name == "envrisk_cache_requests_total":
+            label_map = dict(labels)
+            hits, total = caches.get(label_map["cache"], (0, 0))
+            caches[label_map["cache"]] = (hits + (value if label_map["result"] == "hit" else 0), total + value)
+    for cache_name, (hits, total) in sorted(caches.items()):
+        header("envrisk_cache_hit_ratio", "gauge")
+        lines.append(f"envrisk_cache_hit_ratio{_labels([('cache', cache_name)])} {hits / total if total else 0:.4f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+describe("envrisk_request_seconds", "End-to-end request latency by route.")
+describe("envrisk_stage_seconds", "Latency of one instrumented stage (provider, upstream call, query, render, encode).")
+describe("envrisk_upstream_requests_total", "Upstream HTTP requests by host and outcome (ok, error, timeout).")
+describe("envrisk_cache_requests_total", "Cache lookups by cache and result (hit, miss).")
+describe("envrisk_cache_hit_ratio", "Hits over lookups since start, per cache.")
+describe("envrisk_provider_results_total", "Provider outcomes (ok, error, timeout, loading).")
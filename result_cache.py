@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+import basemap
+import coastal_zones
+import datasets
+import fluvial_rasters
+import metrics
+import seismic_zones
+import sqlite_cache
+
+# === Endpoint result cache ===
+# Finished /risk* responses, keyed by endpoint, (optionally snapped) point,
+# query options and the version of every dataset behind the hazards involved.
+# Entries hold the encoded JSON body and its ETag, so a hit skips both the
+# providers and serialization. An in-process LRU sits in front of an optional
+# SQLite store shared by the workers on a host.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") != "0"
+RESULT_CACHE_PRECISION = os.getenv("RESULT_CACHE_PRECISION", "")  # decimals to snap lat/lon to; empty = exact
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")  # e.g. data/result_cache.sqlite3; empty = LRU only
+RESULT_CACHE_STORE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_STORE_MAX_ENTRIES", "200000"))
+RESULT_CACHE_UPSTREAM_TTL = float(os.getenv("RESULT_CACHE_UPSTREAM_TTL", "86400"))  # seconds, WMS-backed hazards
+RESULT_MAX_AGE = int(os.getenv("RESULT_MAX_AGE", "3600"))  # Cache-Control max-age for clients
+
+# Local datasets per hazard; hazards without any are answered by upstream
+# services, whose entries expire after RESULT_CACHE_UPSTREAM_TTL instead.
+HAZARD_DATASETS = {
+    "fire": ("fire_9605", "fire_0615"),
+    "desertification": ("desert_peninsula", "desert_canarias", "desert_index"),
+}
+
+# Upstream hazards that answer from local stores when they have been built
+LOCAL_STORE_VERSIONS = {
+    "fluvial_flood": lambda: fluvial_rasters.version,
+    "coastal_flood": coastal_zones.version,
+    "seismic": seismic_zones.version,
+}
+
+Entry = namedtuple("Entry", ["body", "etag", "expires_at"])
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_bytes = 0
+_table = sqlite_cache.Table(
+    "results",
+    "CREATE TABLE IF NOT EXISTS results ("
+    " key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT NOT NULL,"
+    " expires_at REAL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)",
+)
+
+
+def snap(lat, lon):
+    if not RESULT_CACHE_PRECISION:
+        return lat, lon
+    digits = int(RESULT_CACHE_PRECISION)
+    return round(lat, digits), round(lon, digits)
+
+
+def hazard_version(hazard):
+    """
+    Version string of what `hazard` answers from, or None while a dataset is still loading.
+    """
+    names = HAZARD_DATASETS.get(hazard)
+    if names is None:
+        local = LOCAL_STORE_VERSIONS.get(hazard)
+        return f"upstream:{local()}" if local else "upstream"
+    versions = [datasets.version(name) for name in names]
+    if None in versions:
+        return None
+    return ":".join(versions + [str(basemap.version)])
+
+
+def make_key(endpoint, hazards, lat, lon, **params):
+    """
+    (key, ttl) for a response, or (None, None) when it must not be cached.
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None, None
+    versions = []
+    for hazard in hazards:
+        version = hazard_version(hazard)
+        if version is None:
+            return None, None
+        versions.append(f"{hazard}={version}")
+    ttl = RESULT_CACHE_UPSTREAM_TTL if any(h not in HAZARD_DATASETS for h in hazards) else None
+    options = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{endpoint}|{lat!r}|{lon!r}|{options}|{';'.join(versions)}", ttl
+
+
+# --- Shared store ---
+def _connection():
+    return _table.connection(RESULT_CACHE_PATH)
+
+
+def _store_get(key):
+    try:
+        with _lock:
+            conn = _connection()
+            row = conn.execute("SELECT body, etag, expires_at FROM results WHERE key=?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET accessed_at=? WHERE key=?", (time.time(), key))
+    except sqlite3.Error as e:
+        print(f"⚠️ Result cache read failed: {e}")
+        return None
+    return Entry(*row) if row is not None else None
+
+
+def _store_put(key, entry):
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.body, entry.etag, entry.expires_at, now, now),
+            )
+            _table.wrote(conn, RESULT_CACHE_STORE_MAX_ENTRIES, "expires_at IS NOT NULL AND expires_at < ?", now)
+    except sqlite3.Error as e:
+        print(f"⚠️ Result cache write failed: {e}")
+
+
+# --- In-process LRU ---
+def _remember(key, entry):
+    global _bytes
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _bytes -= len(previous.body)
+        _entries[key] = entry
+        _bytes += len(entry.body)
+        while _entries and (len(_entries) > RESULT_CACHE_MAX_ENTRIES or _bytes > RESULT_CACHE_MAX_BYTES):
+            _, evicted = _entries.popitem(last=False)
+            _bytes -= len(evicted.body)
+
+
+def _recent(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+    return entry
+
+
+def _stored(key):
+    entry = _store_get(key)
+    if entry is not None:
+        _remember(key, entry)
+    return entry
+
+
+def _fresh(entry):
+    if entry is not None and entry.expires_at is not None and entry.expires_at < time.time():
+        return None
+    return entry
+
+
+def _entry(body, ttl):
+    return Entry(body, f'"{hashlib.sha1(body).hexdigest()}"', None if ttl is None else time.time() + ttl)
+
+
+def get(key):
+    entry = _recent(key)
+    if entry is None and RESULT_CACHE_PATH:
+        entry = _stored(key)
+    return _fresh(entry)
+
+
+def put(key, body, ttl=None):
+    entry = _entry(body, ttl)
+    _remember(key, entry)
+    if RESULT_CACHE_PATH:
+        _store_put(key, entry)
+    return entry
+
+
+async def get_async(key):
+    """
+    get() for the event loop: the shared store is read in a worker thread.
+    """
+    entry = _recent(key)
+    if entry is None and RESULT_CACHE_PATH:
+        entry = await asyncio.to_thread(_stored, key)
+    return _fresh(entry)
+
+
+async def put_async(key, body, ttl=None):
+    """
+    put() for the event loop: the shared store is written in a worker thread.
+    """
+    entry = _entry(body, ttl)
+    _remember(key, entry)
+    if RESULT_CACHE_PATH:
+        await asyncio.to_thread(_store_put, key, entry)
+    return entry
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _bytes = 0
+        if RESULT_CACHE_PATH:
+            _connection().execute("DELETE FROM results")
+
+
+# --- Responses ---
+def etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def max_age(entry):
+    """
+    RESULT_MAX_AGE, cut to what is left of the entry's lifetime so clients
+    do not keep a live-feed answer longer than the server does.
+    """
+    if entry.expires_at is None:
+        return RESULT_MAX_AGE
+    return max(0, min(RESULT_MAX_AGE, round(entry.expires_at - time.time())))
+
+
+def respond(request, entry, state):
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"private, max-age={max_age(entry)}",
+        "X-Cache": state,
+    }
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def serve(request, endpoint, hazards, lat, lon, compute, cacheable=None, ttl=None, **params):
+    """
+    Answer `endpoint` for the point from the cache, or by awaiting compute(lat, lon)
+    (with the snapped point) and caching the result when cacheable(result) is true.
+    By default a result is cacheable unless it reports an error anywhere (see has_error).
+    `ttl` shortens the entry's lifetime, e.g. for live upstream feeds.
+    """
+    lat, lon = snap(lat, lon)
+    key, key_ttl = make_key(endpoint, hazards, lat, lon, **params)
+    if ttl is None or (key_ttl is not None and key_ttl < ttl):
+        ttl = key_ttl
+    if key is not None:
+        entry = await get_async(key)
+        metrics.cache("result", entry is not None)
+        if entry is not None:
+            return respond(request, entry, "hit")
+
+    result = await compute(lat, lon)
+    body = JSONResponse(jsonable_encoder(result)).body
+    if has_error(result) or (cacheable is not None and not cacheable(result)):
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+    if key is None:
+        return Response(content=body, media_type="application/json")
+    return respond(request, await put_async(key, body, ttl), "miss")
+
+
+def has_error(result):
+    """
+    True if `result`, or any dict nested in it, carries an "error" key: how
+    providers mark an upstream outage or failure, which must never be cached.
+    """
+    if not isinstance(result, dict):
+        return False
+    return "error" in result or any(has_error(value) for value in result.values())
@@ -9,12 +9,20 @@
 # known 500y only risk
 # lat = 41.27374622035448
 # lon = 2.0522067636329004
-import requests
-from pyproj import Transformer
+import asyncio
+import json
+import os
+import httpx
+import http_client
+import coastal_zones
 from utils import get_transformer
 
+# {layer} is filled in per request; override to point at a local stand-in WMS
+URL_TEMPLATE = os.getenv("MITECO_WMS_URL", "https://wmts.mapama.gob.es/sig/costas/{layer}/ows")
+FAILED = object()  # zone_properties() result when MITECO could not be asked
 
-def run(lat, lon):
+
+async def run(lat, lon):
     # return {'100': "MITECO service is offline or unavailable.", '500': "MITECO service is offline or unavailable."}
     transformer = get_transformer("EPSG:4326", "EPSG:3857")
     x, y = transformer.transform(lon, lat)
@@ -27,7 +35,7 @@ def run(lat, lon):
 
     def build_featureinfo_url(layer, minx, miny, maxx, maxy):
         return (
-            f"https://wmts.mapama.gob.es/sig/costas/{layer}/ows?"
+            f"{URL_TEMPLATE.format(layer=layer)}?"
             f"SERVICE=WMS&VERSION=1.3.0&REQUEST=GetFeatureInfo&FORMAT=image/png"
             "&TRANSPARENT=true"
             f"&LAYERS={layer}"
@@ -43,48 +51,50 @@ def run(lat, lon):
             "&INFO_FORMAT=application/json"
         )
 
-    def fetch_data(url):
+    async def fetch_data(layer, url):
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await http_client.get_feature_info(layer, lat, lon, url, parse=json.loads, timeout=10)
+        except (httpx.HTTPError, ValueError) as e:
             print(f"Error fetching data from {url}:\n  {e}")
             return None
 
-    url100 = build_featureinfo_url("zim_laminas_q100", minx, miny, maxx, maxy)
-    url500 = build_featureinfo_url("zim_laminas_q500", minx, miny, maxx, maxy)
+    async def zone_properties(layer):
+        # Harvested zones (coastal_zones.py) answer locally; MITECO is the fallback.
+        # Returns the zone's properties, None outside every zone, or FAILED.
+        local = coastal_zones.lookup(layer, lat, lon)
+        if local is not None:
+            return local or None
+        data = await fetch_data(layer, build_featureinfo_url(layer, minx, miny, maxx, maxy))
+        if data is None:
+            return FAILED
+        if data.get("features"):
+            return data["features"][0]["properties"]
+        return None
 
-    data100 = fetch_data(url100)
-    data500 = fetch_data(url500)
+    props100, props500 = await asyncio.gather(
+        zone_properties("zim_laminas_q100"),
+        zone_properties("zim_laminas_q500"),
+    )
 
     output = {}
 
-    if data100 and data100.get("features"):
-        props = data100["features"][0]["properties"]
-        output["100"] = {
-            "cota_max": props.get("Cota máxima (m)"),
-            "cota_media": props.get("Cota media (m)"),
-            "area_km2": props.get("Área (km2)")
-        }
-        print("Coastal 100 risks successfully returned.")
-    else:
-        print("Error with coastal 100 data")
-        output["100"] = "Data not available or service error."
+    for period, props in (("100", props100), ("500", props500)):
+        if props is FAILED:
+            # Marked as an error so result_cache never keeps an outage as an answer
+            print(f"Error with coastal {period} data")
+            output[period] = {"error": "Data not available or service error."}
+        elif props:
+            output[period] = {
+                "cota_max": props.get("Cota máxima (m)"),
+                "cota_media": props.get("Cota media (m)"),
+                "area_km2": props.get("Área (km2)")
+            }
+            print(f"Coastal {period} risks successfully returned.")
+        else:
+            print(f"No coastal {period} flood zone at the point")
+            output[period] = "Data not available or service error."
 
-    if data500 and data500.get("features"):
-        props = data500["features"][0]["properties"]
-        output["500"] = {
-            "cota_max": props.get("Cota máxima (m)"),
-            "cota_media": props.get("Cota media (m)"),
-            "area_km2": props.get("Área (km2)")
-        }
-        print("Coastal 500 risks successfully returned.")
-    else:
-        print("Error with coastal 500 data")
-        output["500"] = "Data not available or service error."
-   
     return output
 
-# output = run(41.27374622035448, 2.0522067636329004)
+# output = asyncio.run(run(41.27374622035448, 2.0522067636329004))
 # print(output)
\ No newline at end of file
@@ -1,64 +1,114 @@
-import math
-from pyproj import Transformer
+import asyncio
+import os
+from io import BytesIO
 
-def get_tile_urls(lat, lon, zoom=18):
-    TILE_SIZE = 256
-    LAYERS = {
-        "100": "zim_laminas_q100",
-        "500": "zim_laminas_q500"
-    }
-    
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-    x, y = transformer.transform(lon, lat)
-
-    # Convert to tile numbers
-    initial_resolution = 2 * math.pi * 6378137 / TILE_SIZE
-    origin_shift = 2 * math.pi * 6378137 / 2.0
-    resolution = initial_resolution / (2**zoom)
-    
-    tx = int((x + origin_shift) / (TILE_SIZE * resolution))
-    ty = int((origin_shift - y) / (TILE_SIZE * resolution))
-
-    urls = {
-        "100": [],
-        "500": []
-    }
+from PIL import Image
+
+import http_client
+import metrics
+import tile_cache
+from tile_cache import TILE_SIZE, tile_bounds, tile_for
+
+# === MITECO coastal flood map tiles ===
+# WMS GetMap tiles on the Web Mercator grid (layer/z/x/y), proxied through
+# tile_cache so neighbouring lookups, and every client, share them. mosaic()
+# stitches the tiles around a point into one image.
+LAYERS = {
+    "100": "zim_laminas_q100",
+    "500": "zim_laminas_q500"
+}
+URL_TEMPLATE = os.getenv("MITECO_WMS_URL", "https://wmts.mapama.gob.es/sig/costas/{layer}/ows")
+MAX_ZOOM = tile_cache.MAX_ZOOM
+
+
+def tile_url(layer, tile_x, tile_y, zoom):
+    minx, miny, maxx, maxy = tile_bounds(tile_x, tile_y, zoom)
+    return (
+        f"{URL_TEMPLATE.format(layer=layer)}?"
+        f"SERVICE=WMS&VERSION=1.3.0&REQUEST=GetMap"
+        f"&FORMAT=image/png"
+        f"&TRANSPARENT=true"
+        f"&LAYERS={layer}"
+        f"&STYLES="
+        f"&WIDTH={TILE_SIZE}&HEIGHT={TILE_SIZE}"
+        f"&CRS=EPSG:3857"
+        f"&BBOX={minx},{miny},{maxx},{maxy}"
+    )
 
+
+def get_tile_urls(lat, lon, zoom=18):
+    """
+    GetMap URLs of the 3x3 tiles around the point, per return period.
+    """
+    tx, ty = tile_for(lat, lon, zoom)
+    urls = {key: [] for key in LAYERS}
     for dx in [-1, 0, 1]:
         for dy in [-1, 0, 1]:
-            tile_x = tx + dx
-            tile_y = ty + dy
+            for key, layer in LAYERS.items():
+                urls[key].append(tile_url(layer, tx + dx, ty + dy, zoom))
+    return urls
 
-            minx = tile_x * TILE_SIZE * resolution - origin_shift
-            maxx = (tile_x + 1) * TILE_SIZE * resolution - origin_shift
-            miny = origin_shift - (tile_y + 1) * TILE_SIZE * resolution
-            maxy = origin_shift - tile_y * TILE_SIZE * resolution
 
-            bbox = f"{minx},{miny},{maxx},{maxy}"
+def tile_path(layer, zoom, tile_x, tile_y):
+    return tile_cache.path(layer, zoom, tile_x, f"{tile_y}.png")
 
-            for key, layer in LAYERS.items():
-                url = (
-                    f"https://wmts.mapama.gob.es/sig/costas/{layer}/ows?"
-                    f"SERVICE=WMS&VERSION=1.3.0&REQUEST=GetMap"
-                    f"&FORMAT=image/png"
-                    f"&TRANSPARENT=true"
-                    f"&LAYERS={layer}"
-                    f"&STYLES="
-                    f"&WIDTH={TILE_SIZE}&HEIGHT={TILE_SIZE}"
-                    f"&CRS=EPSG:3857"
-                    f"&BBOX={bbox}"
-                )
-                urls[key].append(url)
 
-    return urls
+async def _fetch_tile(layer, zoom, tile_x, tile_y):
+    response = await http_client.get(tile_url(layer, tile_x, tile_y, zoom), timeout=10)
+    # WMS errors come back as XML with a 200; only cache real images
+    if not response.headers.get("content-type", "").startswith("image/"):
+        raise ValueError(f"MITECO returned {response.headers.get('content-type')} for {layer}/{zoom}/{tile_x}/{tile_y}")
+    await asyncio.to_thread(tile_cache.write, tile_path(layer, zoom, tile_x, tile_y), response.content)
+    return response.content
+
+
+async def get_tile(layer, zoom, tile_x, tile_y):
+    """
+    PNG bytes of one tile, from the disk cache or MITECO. Concurrent requests
+    for the same missing tile share a single upstream fetch.
+    """
+    content = await asyncio.to_thread(tile_cache.read, tile_path(layer, zoom, tile_x, tile_y))
+    metrics.cache("tile", content is not None)
+    if content is not None:
+        return content
+
+    key = (layer, zoom, tile_x, tile_y)
+    return await tile_cache.single_flight(key, lambda: _fetch_tile(*key))
+
+
+async def mosaic(layer, lat, lon, zoom=18, radius=1):
+    """
+    (image, failed): RGBA image of the (2 * radius + 1)^2 tiles centred on the
+    point's tile, and how many of them could not be fetched (left transparent).
+    """
+    tx, ty = tile_for(lat, lon, zoom)
+    offsets = [(dx, dy) for dy in range(-radius, radius + 1) for dx in range(-radius, radius + 1)]
+    tiles = await asyncio.gather(
+        *(get_tile(layer, zoom, tx + dx, ty + dy) for dx, dy in offsets),
+        return_exceptions=True,
+    )
+
+    side = (2 * radius + 1) * TILE_SIZE
+    image = Image.new("RGBA", (side, side), (0, 0, 0, 0))
+    failed = 0
+    for (dx, dy), content in zip(offsets, tiles):
+        if isinstance(content, Exception):
+            print(f"⚠️ Tile {layer}/{zoom}/{tx + dx}/{ty + dy} unavailable: {content}")
+            failed += 1
+            continue
+        with Image.open(BytesIO(content)) as tile:
+            image.paste(tile.convert("RGBA"), ((dx + radius) * TILE_SIZE, (dy + radius) * TILE_SIZE))
+    return image, failed
+
 
-lat = 41.27270457818908
-lon = 2.0520473550222307
+if __name__ == "__main__":
+    lat = 41.27270457818908
+    lon = 2.0520473550222307
 
-tile_urls = get_tile_urls(lat, lon)
+    tile_urls = get_tile_urls(lat, lon)
 
-# Print sample
-for layer, urls in tile_urls.items():
-    print(f"\nLayer {layer} year flood risk tiles:")
-    for url in urls:
-        print(url)
\ No newline at end of file
+    # Print sample
+    for layer, urls in tile_urls.items():
+        print(f"\nLayer {layer} year flood risk tiles:")
+        for url in urls:
+            print(url)
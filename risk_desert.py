@@ -1,7 +1,7 @@
-from shapely.geometry import Point
-from data_load_desert import gdf, gdf2  # ✅ Preloaded at import
-from utils import filter_polygons_near_point_desert, plot_full_dataset_with_point
-import base64
+import data_load_desert  # ✅ Loaded in parallel at startup
+import basemap
+import metrics
+from utils import render_desert_map, image_to_data_uri
 
 # === Risk code mapping ===
 RISK_LABELS = {
@@ -24,24 +24,66 @@ RISK_COLORS = {
     99: "white"
 }
 
-def get_desertification_risk(lat, lon, GDF):
-    point = Point(lon, lat)
-    match = GDF[GDF.contains(point)]
-
-    if match.empty:
-        return "No Data"
-    
-    risk_code = int(match.iloc[0]["DESER_CLA"])
-    return RISK_LABELS.get(risk_code, f"Unknown code: {risk_code}")
-
-def run(latitude, longitude):
-    risk = get_desertification_risk(latitude, longitude, gdf)
-    image_base64 = ""
-    if risk != "No Data":
-        image_base64 = plot_full_dataset_with_point(gdf, latitude, longitude, RISK_LABELS, RISK_COLORS)
-    else:
-        risk = get_desertification_risk(latitude, longitude, gdf2)
-        # Optional: generate second image for Canarias if needed
-        image_base64 = plot_full_dataset_with_point(gdf2, latitude, longitude, RISK_LABELS, RISK_COLORS)
+def get_desertification_risk(lat, lon):
+    """
+    Look the point up in the combined peninsula + Canarias index.
+    Returns (risk label, dataset name); the dataset is None when no polygon contains the point.
+    """
+    with metrics.span("query.desert"):
+        match = data_load_desert.get_index().find(lon, lat)
+    return describe_match(match)
+
+def describe_match(match):
+    if match is None:
+        return "No Data", None
+
+    dataset, _, code = match
+    risk_code = int(code)
+    return RISK_LABELS.get(risk_code, f"Unknown code: {risk_code}"), dataset
+
+def render_map(latitude, longitude, dataset=None):
+    """
+    PIL image of the 100 km desertification map, or None when no dataset covers the point.
+    `dataset` is the one already found for the point; it is looked up when not given.
+    """
+    if dataset is None:
+        _, dataset = get_desertification_risk(latitude, longitude)
+    if dataset is None:
+        return None
+    with metrics.span("render.desert"):
+        image = basemap.render_window("desert", latitude, longitude)
+        metrics.cache("basemap", image is not None)
+        if image is None:
+            frame, centroids = data_load_desert.get(dataset)
+            image = render_desert_map(frame, centroids, latitude, longitude, RISK_COLORS)
+    return image
+
+def desert_map(latitude, longitude, dataset=None):
+    image = render_map(latitude, longitude, dataset)
+    if image is None:
+        return ""
+    with metrics.span("encode.desert"):
+        return image_to_data_uri(image, quality=80)
+
+def run(latitude, longitude, images=True):
+    risk, dataset = get_desertification_risk(latitude, longitude)
+    output = {"risk": risk, "dataset": dataset}
+    if images:
+        output["img"] = desert_map(latitude, longitude, dataset) if dataset is not None else ""
     print("Desert risks successfully returned.")
-    return {"risk": risk, "img": image_base64}
\ No newline at end of file
+    return output
+
+def run_batch(latitudes, longitudes, images=False):
+    """
+    Desertification risk for many points with a single vectorized index query.
+    """
+    outputs = []
+    with metrics.span("query.desert"):
+        matches = data_load_desert.get_index().find_many(longitudes, latitudes)
+    for lat, lon, match in zip(latitudes, longitudes, matches):
+        risk, dataset = describe_match(match)
+        output = {"risk": risk, "dataset": dataset}
+        if images:
+            output["img"] = desert_map(lat, lon, dataset) if dataset is not None else ""
+        outputs.append(output)
+    return outputs
@@ -1,31 +1,67 @@
-from shapely.geometry import shape, Point
-import data_load_fire  # import the preloaded module
-from utils import filter_polygons_near_point, generate_fire_map  # reuse existing helpers
+import data_load_fire  # datasets load in parallel at startup
+import basemap
+import metrics
+from utils import filter_polygons_near_point, render_fire_map, image_to_data_uri  # reuse existing helpers
 
-def run(lat, lon):
-    point = Point(lon, lat)
-    output = {}
+MAP_LAYERS = ("fire_96_05", "fire_06_15")
+
+def render_map(layer, lat, lon):
+    """
+    PIL image of the 100 km fire map for one period ("fire_96_05" or "fire_06_15").
+    Slices the pre-rendered basemap when it exists, otherwise draws the polygons.
+    """
+    with metrics.span("render.fire"):
+        image = basemap.render_window(layer, lat, lon)
+        metrics.cache("basemap", image is not None)
+        if image is None:
+            centroids = data_load_fire.get("9605" if layer == "fire_96_05" else "0615").centroids
+            image = render_fire_map(filter_polygons_near_point(centroids, lat, lon), lat, lon)
+    return image
+
+def fire_map(layer, lat, lon):
+    image = render_map(layer, lat, lon)
+    if image is None:
+        return ""
+    with metrics.span("encode.fire"):
+        return image_to_data_uri(image, quality=50)
 
-    # === 1. Match polygons containing the point ===
-    match_9605 = next((f for f in data_load_fire.geojson_9605["features"] if shape(f["geometry"]).contains(point)), None)
-    match_0615 = next((f for f in data_load_fire.geojson_0615["features"] if shape(f["geometry"]).contains(point)), None)
+def describe_match(match):
+    return {
+        "name": match["properties"].get("Término municipal", "Unknown"),
+        "data": match["properties"]
+    } if match else "No risk"
 
-    output["96_05"] = {
-        "name": match_9605["properties"].get("Término municipal", "Unknown"),
-        "data": match_9605["properties"]
-    } if match_9605 else "No risk"
+def run(lat, lon, images=True):
+    output = {}
 
-    output["06_15"] = {
-        "name": match_0615["properties"].get("Término municipal", "Unknown"),
-        "data": match_0615["properties"]
-    } if match_0615 else "No risk"
+    # === 1. Match polygons containing the point (prebuilt STRtree) ===
+    with metrics.span("query.fire"):
+        match_9605 = data_load_fire.get("9605").index.find(lon, lat)
+        match_0615 = data_load_fire.get("0615").index.find(lon, lat)
 
-    # === 2. Filter nearby polygons ===
-    filtered_9605 = filter_polygons_near_point(data_load_fire.polys_9605, lat, lon)
-    filtered_0615 = filter_polygons_near_point(data_load_fire.polys_0615, lat, lon)
+    output["96_05"] = describe_match(match_9605)
+    output["06_15"] = describe_match(match_0615)
 
-    # === 3. Generate fire maps ===
-    output["image_96_05"] = generate_fire_map(filtered_9605, lat, lon)
-    output["image_06_15"] = generate_fire_map(filtered_0615, lat, lon)
+    # === 2. Fire maps of the 100 km neighbourhood (skipped when images=False) ===
+    if images:
+        output["image_96_05"] = fire_map("fire_96_05", lat, lon)
+        output["image_06_15"] = fire_map("fire_06_15", lat, lon)
 
     return output
+
+def run_batch(lats, lons, images=False):
+    """
+    Fire risk for many points, with one vectorized index query per period.
+    """
+    with metrics.span("query.fire"):
+        matches_9605 = data_load_fire.get("9605").index.find_many(lons, lats)
+        matches_0615 = data_load_fire.get("0615").index.find_many(lons, lats)
+
+    outputs = []
+    for lat, lon, match_9605, match_0615 in zip(lats, lons, matches_9605, matches_0615):
+        output = {"96_05": describe_match(match_9605), "06_15": describe_match(match_0615)}
+        if images:
+            output["image_96_05"] = fire_map("fire_96_05", lat, lon)
+            output["image_06_15"] = fire_map("fire_06_15", lat, lon)
+        outputs.append(output)
+    return outputs
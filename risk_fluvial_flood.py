@@ -1,11 +1,62 @@
-import requests
-from pyproj import Transformer
+import asyncio
+import math
+import os
+import http_client
+import fluvial_rasters
+import metrics
+from utils import get_transformer
 
+URL = os.getenv("IDEE_WMS_URL", "https://servicios.idee.es/wms-inspire/riesgos-naturales/inundaciones")
+LAYERS = ["NZ.Flood.FluvialT10", "NZ.Flood.FluvialT100", "NZ.Flood.FluvialT500"]
 
-def run(lat, lon):
+
+def parse_gray_index(text):
+    if "GRAY_INDEX =" not in text:
+        # e.g. a ServiceExceptionReport sent with a 200; never cached (see http_client)
+        raise ValueError(f"No GRAY_INDEX in GetFeatureInfo answer: {text[:80]!r}")
+    val = float(text.split("GRAY_INDEX =")[1].split('\n')[0].strip())
+    return val if val > -1e+38 else 0
+
+
+async def fetch_depth(layer, lat, lon, minx, miny, maxx, maxy, i=128, j=128):
+    # Construct WMS GetFeatureInfo request
+    params = {
+        "SERVICE": "WMS",
+        "VERSION": "1.3.0",
+        "REQUEST": "GetFeatureInfo",
+        "LAYERS": layer,
+        "QUERY_LAYERS": layer,
+        "CRS": "EPSG:3857",
+        "BBOX": f"{minx},{miny},{maxx},{maxy}",
+        "WIDTH": "256",
+        "HEIGHT": "256",
+        "I": str(i),
+        "J": str(j),
+        "INFO_FORMAT": "text/plain"
+    }
+
+    return await http_client.get_feature_info(layer, lat, lon, URL, params=params, parse=parse_gray_index, timeout=5)
+
+
+def sample_batch(lats, lons):
+    """
+    Local-grid answers for many points at once: {"10", "100", "500"} depths for each
+    point every return period's grids cover, None where IDEE has to be asked.
+    """
+    depths = [fluvial_rasters.sample_many(period, lats, lons) for period in fluvial_rasters.PERIODS]
+    answers = []
+    for values in zip(*depths):
+        if any(math.isnan(value) for value in values):
+            answers.append(None)
+        else:
+            answers.append({period: float(value) for period, value in zip(fluvial_rasters.PERIODS, values)})
+    return answers
+
+
+async def run(lat, lon):
     # return("MITECO service is offline or unavailable.")
     # Step 2: Convert to EPSG:3857 (Web Mercator)
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+    transformer = get_transformer("EPSG:4326", "EPSG:3857")
     x, y = transformer.transform(lon, lat)
 
     # Step 3: Create bounding box around the point (256x256 tile, 128m buffer)
@@ -15,59 +66,28 @@ def run(lat, lon):
     miny = y - buffer
     maxy = y + buffer
 
-    # Step 4: Set pixel location (center of tile)
-    i = 128
-    j = 128
+    # Step 4: Sample the local depth grids; ask IDEE (all at once) only where they have no coverage
+    async def depth(period, layer):
+        local = fluvial_rasters.sample(period, lat, lon)
+        metrics.cache("fluvial_raster", local is not None)
+        if local is not None:
+            return local
+        return await fetch_depth(layer, lat, lon, minx, miny, maxx, maxy)
+
+    results = await asyncio.gather(
+        *(depth(period, layer) for period, layer in zip(fluvial_rasters.PERIODS, LAYERS)),
+        return_exceptions=True,
+    )
 
-    layers = ["NZ.Flood.FluvialT10", "NZ.Flood.FluvialT100", "NZ.Flood.FluvialT500"]
-    results = []
     wasError = False
-    print()
-
-    for n in range(3):
-        # Step 5: Construct WMS GetFeatureInfo request
-        url = "https://servicios.idee.es/wms-inspire/riesgos-naturales/inundaciones"
-        params = {
-            "SERVICE": "WMS",
-            "VERSION": "1.3.0",
-            "REQUEST": "GetFeatureInfo",
-            "LAYERS": layers[n],
-            "QUERY_LAYERS": layers[n],
-            "CRS": "EPSG:3857",
-            "BBOX": f"{minx},{miny},{maxx},{maxy}",
-            "WIDTH": "256",
-            "HEIGHT": "256",
-            "I": str(i),
-            "J": str(j),
-            "INFO_FORMAT": "text/plain"
-        }
-
-        # Step 6: Make the request
-        try:
-            response = requests.get(url, params=params, timeout=5)
-            if response.status_code == 200:
-                text = response.text
-                val = float(text.split("GRAY_INDEX =")[1].split('\n')[0].strip())
-                if val > -1e+38:
-                    results.append(val)
-                    # print(f"Reading: {val}")
-                else:
-                    results.append(0)
-                    # print(f"Reading: 0")
-        except Exception as e:
+    for layer, result in zip(LAYERS, results):
+        if isinstance(result, Exception):
             wasError = True
-            print(f"Error at offset {n}:", e)
+            print(f"Error at layer {layer}:", result)
 
-    # Step 7: Print results
+    # Step 5: Return results
     if wasError == False:
         risks = {'10': results[0], '100': results[1], '500': results[2]}
-        # print()
-        # print("Risks")
-        # print("-----")
-        # print(f"10 year {risks['10']}")
-        # print(f"100 year {risks['100']}")
-        # print(f"500 year {risks['500']}")
-        # print()
         output = risks
         print("Fluvial risks successfully returned")
         return output
@@ -75,5 +95,5 @@ def run(lat, lon):
         print("There was an error fetching the data")
         return("MITECO service is offline or unavailable.")
 
-# output = run(41.283645999461406, 2.064729668547003)
-# print(output)
\ No newline at end of file
+# output = asyncio.run(run(41.283645999461406, 2.064729668547003))
+# print(output)
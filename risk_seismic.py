@@ -1,47 +1,98 @@
-import requests
-from pyproj import Transformer
+import asyncio
+import json
+import os
+import httpx
+import http_client
+import seismic_zones
 from utils import get_transformer
 
+URL = os.getenv("IGN_WMS_URL", "https://www.ign.es/wms-inspire/geofisica")
+
+# ttl: seconds an answer stays in wms_cache (None = static map, cached indefinitely)
+STATIC = None
+
 LAYERS = {
     "HazardArea2015.PGA475_p": {
         "description": "Peak Ground Acceleration (g) with 475-year return period.",
         "property": "PGA_g",
+        "ttl": STATIC,
     },
     "HazardArea2015.PGA475_c": {
         "description": "PGA isolines for seismic hazard mapping.",
-        "property": None
+        "property": None,
+        "ttl": STATIC,
     },
     "HazardArea2015.Int475": {
         "description": "Expected seismic intensity with 475-year return period.",
         "property": "Int475",
+        "ttl": STATIC,
     },
     "HazardArea2002.NCSE-02": {
         "description": "Seismic hazard based on NCSE-02 norm (2002).",
         "property": "ab",
+        "ttl": STATIC,
     },
     "NZ.ObservedEvent": {
         "description": "Full earthquake catalog from 1370 to present.",
         "property": "magnitude",
+        "ttl": 24 * 3600,
     },
     "Ultimos10dias": {
         "description": "Recent earthquakes (last 10 days).",
         "property": "magnitude",
+        "ttl": 5 * 60,
     },
     "Ultimos30dias": {
         "description": "Recent earthquakes (last 30 days).",
         "property": "magnitude",
+        "ttl": 15 * 60,
     },
     "Ultimos365dias": {
         "description": "Recent earthquakes (last 12 months).",
         "property": "magnitude",
+        "ttl": 3600,
     },
     "GE.Geophysics.seismologicalStation": {
         "description": "Seismic velocity stations of the IGN.",
         "property": "stationCode",
+        "ttl": 7 * 24 * 3600,
     },
 }
 
-def run(lat, lon):
+DEFAULT_LAYERS = ("HazardArea2002.NCSE-02",)
+
+
+def parse_layers(value):
+    """
+    Layer names from a comma-separated `layers=` value ("all" for every layer).
+    Raises ValueError on unknown names; None/empty gives DEFAULT_LAYERS.
+    """
+    if not value:
+        return list(DEFAULT_LAYERS)
+    if value.strip() == "all":
+        return list(LAYERS)
+    layers = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in layers if name not in LAYERS]
+    if unknown:
+        raise ValueError(f"Unknown seismic layers: {', '.join(unknown)}")
+    return list(dict.fromkeys(layers))
+
+
+def layers_ttl(layers):
+    """
+    Shortest ttl among `layers`, or None when they are all static.
+    """
+    ttls = [LAYERS[name]["ttl"] for name in layers if LAYERS[name]["ttl"] is not None]
+    return min(ttls) if ttls else None
+
+
+async def run(lat, lon, layers=None):
+    """
+    Features at the point for each of `layers` (default DEFAULT_LAYERS): from the
+    local zone store when the layer was ingested, otherwise fetched from IGN
+    concurrently and cached per layer for its ttl.
+    """
+    layers = list(layers or DEFAULT_LAYERS)
     transformer = get_transformer("EPSG:4326", "EPSG:3857")
     x, y = transformer.transform(lon, lat)
 
@@ -53,7 +104,7 @@ def run(lat, lon):
 
     def build_url(layer):
         return (
-            "https://www.ign.es/wms-inspire/geofisica?"
+            f"{URL}?"
             "SERVICE=WMS&VERSION=1.3.0&REQUEST=GetFeatureInfo"
             "&FORMAT=image/png"
             "&TRANSPARENT=true"
@@ -67,24 +118,34 @@ def run(lat, lon):
             "&INFO_FORMAT=application/json"
         )
 
-    def fetch_data(url):
+    async def fetch_data(layer, url):
+        ttl = LAYERS[layer]["ttl"]
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await http_client.get_feature_info(
+                layer, lat, lon, url, parse=json.loads, timeout=10,
+                ttl=float("inf") if ttl is STATIC else ttl,
+            )
+        except (httpx.HTTPError, ValueError) as e:
             print(f"Error fetching seismic data from IGN:\n  {e}")
             return None
 
+    # Static zones ingested locally (seismic_zones.py) need no round-trip
+    local = {name: seismic_zones.lookup(name, lat, lon) for name in layers}
+    remote = [name for name in layers if local[name] is None]
+    fetched = dict(zip(remote, await asyncio.gather(*(fetch_data(name, build_url(name)) for name in remote))))
+
     output = {}
 
-    for layer_name, meta in LAYERS.items():
-        url = build_url(layer_name)
-        if (layer_name != "HazardArea2002.NCSE-02"):
-            continue
-        data = fetch_data(url)
+    for layer_name in layers:
+        meta = LAYERS[layer_name]
+        data = fetched.get(layer_name)
 
-        if data and data.get("features") and len(data["features"]) > 0:
+        if local[layer_name] is not None:
+            output[layer_name] = {
+                "description": meta.get("description", ""),
+                "features": local[layer_name],
+            }
+        elif data and data.get("features") and len(data["features"]) > 0:
             feature_list = []
             for feature in data["features"]:
                 parsed = {
@@ -99,6 +160,14 @@ def run(lat, lon):
                 "features": feature_list
             }
             print(f"✓ {layer_name} returned {len(feature_list)} features.")
+        elif data is None:
+            # Marked as an error so result_cache never keeps an outage as "no features"
+            output[layer_name] = {
+                "description": meta.get("description", ""),
+                "features": [],
+                "error": "IGN service error",
+            }
+            print(f"⚠ {layer_name} could not be fetched.")
         else:
             output[layer_name] = {
                 "description": meta.get("description", ""),
@@ -106,4 +175,3 @@ def run(lat, lon):
             }
             print(f"⚠ {layer_name} returned no features.")
     return output
-
@@ -0,0 +1,62 @@
+import argparse
+import os
+
+import geopandas as gpd
+
+import zone_store
+
+# === Local seismic hazard zones ===
+# `python seismic_zones.py ingest --layer HazardArea2002.NCSE-02 ncse02.shp`
+# stores a static IGN hazard layer (any file or URL geopandas can read, e.g. a
+# WFS GetFeature request with GeoJSON output) as a geobundle under
+# data/seismic. Ingested layers load with the other datasets at startup and
+# risk_seismic answers them with a point-in-polygon query; IGN is only asked
+# for layers that have no local store, or while it is still loading.
+SEISMIC_ZONES_DIR = os.getenv("SEISMIC_ZONES_DIR", "data/seismic")
+
+# Layers worth keeping locally: static maps, unlike the earthquake feeds
+LOCAL_LAYERS = ("HazardArea2002.NCSE-02", "HazardArea2015.PGA475_p", "HazardArea2015.Int475")
+
+store = zone_store.ZoneStore("seismic", SEISMIC_ZONES_DIR, LOCAL_LAYERS)
+version = store.version
+
+
+def ingest(layer, source, value_property=None, directory=None):
+    """
+    Read `source` and write it as the bundle for `layer`.
+    `value_property` is also stored as a numeric array so lookups return it as a number.
+    """
+    path, count = store.write(layer, gpd.read_file(source), [value_property] if value_property else (), directory)
+    print(f"✅ Ingested {count} {layer} zones into {path}")
+
+
+def lookup(layer, lat, lon):
+    """
+    IGN-style feature list for the zone containing the point, or None when the
+    layer has no local store (or it is not loaded yet) and IGN must be asked.
+    """
+    found = store.find(layer, lat, lon)
+    if found is None:
+        return None
+    bundle, position = found
+    if position is None:
+        return []
+
+    return [{"id": f"{layer}.{position}", "properties": bundle.row(position), "geometry": None}]
+
+
+# === Registered for parallel loading at startup (only layers that were ingested) ===
+store.register()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store static IGN seismic hazard layers locally.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = sub.add_parser("ingest", help="write one layer's zones as a local bundle")
+    ingest_parser.add_argument("--layer", required=True, choices=LOCAL_LAYERS)
+    ingest_parser.add_argument("--property", help="numeric attribute to keep as a number (default: the layer's)")
+    ingest_parser.add_argument("source", help="shapefile, GeoJSON, GeoPackage or WFS GetFeature URL")
+    args = parser.parse_args()
+
+    from risk_seismic import LAYERS
+    ingest(args.layer, args.source, args.property or LAYERS[args.layer]["property"])
@@ -0,0 +1,85 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely.geometry import Point
+from shapely.strtree import STRtree
+from utils import get_transformer
+
+
+class PolygonIndex:
+    """
+    Point-in-polygon lookup over a fixed set of polygons.
+    Geometries are prepared and packed into an STRtree once, at load time;
+    `records[i]` is what a lookup returns for a point inside `geometries[i]`;
+    any sequence works, including lazy views such as geobundle.PropertyRows.
+    """
+
+    def __init__(self, geometries, records):
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.records = records if hasattr(records, "__getitem__") else list(records)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.records)
+
+    def find_position(self, lon, lat):
+        # "within" tests the query point against each candidate, so only
+        # polygons that strictly contain the point are returned. The lowest
+        # position wins to keep the original first-match-in-file order.
+        hits = self.tree.query(Point(lon, lat), predicate="within")
+        if len(hits) == 0:
+            return None
+        return int(hits.min())
+
+    def find(self, lon, lat):
+        position = self.find_position(lon, lat)
+        return None if position is None else self.records[position]
+
+    def find_positions(self, lons, lats):
+        """
+        Vectorized find_position: one tree query for a whole batch of points.
+        Returns an int array with -1 where no polygon contains the point.
+        """
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_idx, tree_idx = self.tree.query(points, predicate="within")
+        positions = np.full(len(points), len(self.records), dtype=np.int64)
+        np.minimum.at(positions, point_idx, tree_idx)
+        positions[positions == len(self.records)] = -1
+        return positions
+
+    def find_many(self, lons, lats):
+        return [None if p < 0 else self.records[p] for p in self.find_positions(lons, lats)]
+
+
+class CentroidIndex:
+    """
+    Projected centroids of a fixed polygon set, for "within N km" queries.
+    Polygons are reprojected and their centroids taken once, at load time;
+    a query is then a single vectorized distance test over the centroid arrays.
+    Pass `centroids=(x, y)` when they were precomputed (e.g. from a geobundle).
+    """
+
+    def __init__(self, geometries, values=None, crs="EPSG:4326", projected_crs="EPSG:25830", centroids=None):
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.values = None if values is None else np.asarray(values, dtype=float)
+        self.crs = crs
+        self.projected_crs = projected_crs
+
+        if centroids is None:
+            projected = gpd.GeoSeries(self.geometries, crs=crs).to_crs(projected_crs).centroid
+            centroids = (projected.x.to_numpy(), projected.y.to_numpy())
+        self.x, self.y = (np.asarray(c, dtype=float) for c in centroids)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def near(self, lat, lon, max_km=100):
+        """
+        Positions of the polygons whose projected centroid lies within max_km of the point.
+        """
+        x, y = get_transformer(self.crs, self.projected_crs).transform(lon, lat)
+        radius = max_km * 1000
+        dx = self.x - x
+        dy = self.y - y
+        return np.flatnonzero(dx * dx + dy * dy <= radius * radius)
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+
+# === SQLite-backed caches ===
+# wms_cache and result_cache keep entries in a SQLite file shared by every
+# worker on a host. Each owns one Table: a lazily opened connection in WAL
+# mode (readers never block the writer) and a size bound enforced by dropping
+# the least recently used rows. Callers serialize access with their own lock.
+EVICT_EVERY = 1000  # check the size bound every N writes
+
+
+class Table:
+    """
+    A cache table created by `schema` (CREATE ... IF NOT EXISTS statements).
+    Rows must have an `accessed_at` column for eviction.
+    """
+
+    def __init__(self, name, *schema):
+        self.name = name
+        self.schema = schema
+        self.writes = 0
+        self._conn = None
+        self._opened = None  # (path, pid) of _conn
+
+    def connection(self, path):
+        # Opened lazily and per process, so it is never shared across a fork
+        if self._conn is None or self._opened != (path, os.getpid()):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            self._conn, self._opened = conn, (path, os.getpid())
+        return self._conn
+
+    def wrote(self, conn, max_entries, expired=None, *params):
+        """
+        Count one write. Every EVICT_EVERY writes, delete the rows matching the
+        `expired` WHERE clause (if any) and then the least recently used rows
+        beyond max_entries.
+        """
+        self.writes += 1
+        if self.writes % EVICT_EVERY == 0:
+            if expired:
+                conn.execute(f"DELETE FROM {self.name} WHERE {expired}", params)
+            self.evict(conn, max_entries)
+
+    def evict(self, conn, max_entries):
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+        excess = count - max_entries
+        if excess > 0:
+            conn.execute(
+                f"DELETE FROM {self.name} WHERE rowid IN"
+                f" (SELECT rowid FROM {self.name} ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def reset(self):
+        """
+        Forget the connection and write count (tests point caches at new files).
+        """
+        self.writes = 0
+        self._conn = self._opened = None
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the top-level modules the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client():
+    """
+    TestClient for main.app with authentication bypassed. Startup hooks do not
+    run, so no datasets load and no JWKS is fetched.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+    from auth import verify_token
+
+    main.app.dependency_overrides[verify_token] = lambda: {"sub": "tester"}
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
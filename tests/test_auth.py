@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from jose import jwk, jwt
+
+import auth
+
+# === auth against a local JWKS stand-in ===
+DOMAIN = "tenant.test"
+AUDIENCE = "https://envrisk.test/api"
+
+
+def make_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ).decode("ascii")
+    public_pem = private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode("ascii")
+    public = jwk.construct(public_pem, "RS256").to_dict()
+    return {"kid": kid, "private_pem": private_pem, "jwk": {**public, "kid": kid, "use": "sig"}}
+
+
+KEYS = {kid: make_key(kid) for kid in ("key-1", "key-2")}
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        body = json.dumps({"keys": [KEYS[kid]["jwk"] for kid in server.kids]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def jwks_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JWKSHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def jwks(jwks_server, monkeypatch):
+    jwks_server.kids = ["key-1"]
+    jwks_server.requests = 0
+    monkeypatch.setattr(auth, "AUTH0_DOMAIN", DOMAIN)
+    monkeypatch.setattr(auth, "API_AUDIENCE", AUDIENCE)
+    monkeypatch.setattr(auth, "JWKS_URL", f"http://127.0.0.1:{jwks_server.server_address[1]}/.well-known/jwks.json")
+    monkeypatch.setattr(auth, "signing_keys", {})
+    monkeypatch.setattr(auth, "_last_refresh", 0.0)
+    auth._verified.clear()
+    yield jwks_server
+    auth.stop_jwks_refresh()
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    real_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+def token(kid="key-1", sub="user", expires_in=3600):
+    claims = {"sub": sub, "aud": AUDIENCE, "iss": f"https://{DOMAIN}/", "exp": int(time.time()) + expires_in}
+    return jwt.encode(claims, KEYS[kid]["private_pem"], algorithm="RS256", headers={"kid": kid})
+
+
+def verify(value):
+    return auth.verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=value))
+
+
+def test_keys_are_fetched_once_and_cached_by_kid(jwks, decodes):
+    assert verify(token(sub="a"))["sub"] == "a"
+    assert verify(token(sub="b"))["sub"] == "b"
+    assert jwks.requests == 1
+    assert list(auth.signing_keys) == ["key-1"]
+    assert len(decodes) == 2
+
+
+def test_verified_token_is_cached_until_exp(jwks, decodes, monkeypatch):
+    value = token(expires_in=60)
+    verify(value)
+    verify(value)
+    assert len(decodes) == 1
+
+    clock = types.SimpleNamespace(time=lambda: time.time() + 61)
+    monkeypatch.setattr(auth, "time", clock)
+    verify(value)  # past exp for the cache; jose still accepts it on the real clock
+    assert len(decodes) == 2
+
+
+def test_unknown_kid_refreshes_keys_after_rotation(jwks, monkeypatch):
+    monkeypatch.setattr(auth, "JWKS_MIN_REFRESH_INTERVAL", 0)
+    verify(token("key-1"))
+    jwks.kids = ["key-2"]  # rotated at the identity provider
+
+    assert verify(token("key-2"))["sub"] == "user"
+    assert jwks.requests == 2
+    assert list(auth.signing_keys) == ["key-2"]
+
+
+def test_unknown_kid_refreshes_are_rate_limited(jwks, monkeypatch):
+    monkeypatch.setattr(auth, "JWKS_MIN_REFRESH_INTERVAL", 3600)
+    verify(token("key-1"))
+    jwks.kids = ["key-2"]
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as error:
+            verify(token("key-2"))
+        assert error.value.status_code == 401
+    assert jwks.requests == 1
+
+
+def test_token_is_verified_once_per_request(jwks, monkeypatch):
+    # As in main.py: verify_token both as a route dependency and as a parameter
+    calls = []
+    real_cached_payload = auth._cached_payload
+    monkeypatch.setattr(auth, "_cached_payload", lambda token_hash: calls.append(1) or real_cached_payload(token_hash))
+
+    app = FastAPI()
+
+    @app.get("/protected", dependencies=[Depends(auth.verify_token)])
+    def protected(token_data: dict = Depends(auth.verify_token)):
+        return {"sub": token_data["sub"]}
+
+    response = TestClient(app).get("/protected", headers={"Authorization": f"Bearer {token(sub='client')}"})
+    assert response.status_code == 200
+    assert response.json() == {"sub": "client"}
+    assert len(calls) == 1
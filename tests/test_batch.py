@@ -0,0 +1,111 @@
+import pytest
+
+import datasets
+import fluvial_rasters
+import main
+
+# === /risk/batch ===
+HEADER = "ncols 3\nnrows 2\nxllcorner 2.0\nyllcorner 41.0\ncellsize 0.1\n"
+
+
+def fake_batch(name):
+    def run_batch(lats, lons, images=False):
+        return [{"hazard": name, "lat": lat} for lat in lats]
+    return run_batch
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Every hazard answered by fakes; returns the (hazard, lat, lon) of each upstream call.
+    """
+    calls = []
+
+    def fake_run(name):
+        async def run(lat, lon, **kwargs):
+            calls.append((name, lat, lon))
+            return {"hazard": name}
+        return run
+
+    for name in ("fluvial_flood", "coastal_flood", "seismic"):
+        monkeypatch.setitem(main.PROVIDERS, name, (fake_run(name), name))
+    for name in main.BATCH_PROVIDERS:
+        monkeypatch.setitem(main.BATCH_PROVIDERS, name, fake_batch(name))
+    monkeypatch.setattr(fluvial_rasters, "rasters", {period: [] for period in fluvial_rasters.PERIODS})
+    monkeypatch.setattr(fluvial_rasters, "version", None)
+    return calls
+
+
+def post(client, points, **body):
+    return client.post("/risk/batch", json={"points": [{"lat": lat, "lon": lon} for lat, lon in points], **body})
+
+
+def test_only_requested_hazards_are_answered(client, upstream):
+    response = post(client, [(41.27, 2.05)], hazards=["fire", "seismic"])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["status"]) == {"fire", "seismic"}
+    assert set(body["results"][0]) == {"lat", "lon", "fire", "seismic"}
+    assert [name for name, _, _ in upstream] == ["seismic"]
+
+
+def test_every_hazard_by_default(client, upstream):
+    body = post(client, [(41.27, 2.05)]).json()
+    assert set(body["status"]) == set(main.PROVIDERS)
+    assert all(status == "ok" for status in body["status"].values())
+
+
+def test_unknown_hazard_is_400(client, upstream):
+    assert post(client, [(41.27, 2.05)], hazards=["volcano"]).status_code == 400
+
+
+def test_too_many_points_is_413(client, upstream, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_POINTS", 2)
+    assert post(client, [(41.0, 2.0)] * 3, hazards=["fire"]).status_code == 413
+    assert upstream == []
+
+
+def test_one_upstream_call_per_shared_cell(client, upstream):
+    points = [(41.27001, 2.05001), (41.27002, 2.05002), (40.0, -3.0)]  # first two share a cell
+    body = post(client, points, hazards=["coastal_flood"]).json()
+
+    assert len(upstream) == 2
+    assert [row["coastal_flood"] for row in body["results"]] == [{"hazard": "coastal_flood"}] * 3
+
+
+def test_fluvial_points_covered_by_local_grids_skip_idee(client, upstream, tmp_path):
+    source = tmp_path / "grid.asc"
+    source.write_text(HEADER + "0.5 1 1.5\n0 2.25 3\n", encoding="utf-8")
+    for period in fluvial_rasters.PERIODS:
+        fluvial_rasters.ingest(period, [str(source)], crs="EPSG:4326", directory=str(tmp_path / "out"))
+    fluvial_rasters.load_rasters(str(tmp_path / "out"))
+
+    body = post(client, [(41.15, 2.05), (41.05, 2.25), (40.0, -3.0)], hazards=["fluvial_flood"]).json()
+
+    results = [row["fluvial_flood"] for row in body["results"]]
+    assert results[0] == {"10": 0.5, "100": 0.5, "500": 0.5}
+    assert results[1] == {"10": 3.0, "100": 3.0, "500": 3.0}
+    assert results[2] == {"hazard": "fluvial_flood"}
+    assert upstream == [("fluvial_flood", 40.0, -3.0)]
+
+
+@pytest.mark.parametrize("hazard", list(main.PROVIDERS))
+def test_dataset_not_ready_reports_loading(client, upstream, monkeypatch, hazard):
+    def not_ready(*args, **kwargs):
+        raise datasets.DatasetNotReady(hazard, "loading")
+
+    async def not_ready_async(*args, **kwargs):
+        not_ready()
+
+    if hazard in main.BATCH_PROVIDERS:
+        monkeypatch.setitem(main.BATCH_PROVIDERS, hazard, not_ready)
+    else:
+        monkeypatch.setitem(main.PROVIDERS, hazard, (not_ready_async, hazard))
+
+    body = post(client, [(41.27, 2.05), (40.0, -3.0)], hazards=[hazard, "fire"] if hazard != "fire" else [hazard]).json()
+
+    assert body["status"][hazard] == "loading"
+    assert all("error" in row[hazard] for row in body["results"])
+    if hazard != "fire":
+        assert body["status"]["fire"] == "ok"
@@ -0,0 +1,141 @@
+import asyncio
+import base64
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import http_client
+import risk_coastal_map
+import tile_cache
+from benchmarks import fake_wms
+
+# === Coastal mosaics: partial and failed tile sets are never cached ===
+LAYER = risk_coastal_map.LAYERS["100"]
+POINT = {"lat": 41.2727, "lon": 2.052}
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new("RGBA", (tile_cache.TILE_SIZE, tile_cache.TILE_SIZE), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+BLUE = png((0, 0, 255, 120))
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = fake_wms.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def miteco(server, tmp_path, monkeypatch):
+    server.recordings = fake_wms.load_recordings()
+    server.recordings["miteco"][f"GetMap:{LAYER}"] = {
+        "status": 200, "content_type": "image/png", "body_base64": base64.b64encode(BLUE).decode(),
+    }
+    monkeypatch.setattr(risk_coastal_map, "URL_TEMPLATE", fake_wms.service_urls(server)["MITECO_WMS_URL"])
+    monkeypatch.setattr(tile_cache, "TILE_CACHE_DIR", str(tmp_path / "tiles"))
+    return server
+
+
+def mosaic(**kwargs):
+    async def go():
+        await http_client.start()
+        try:
+            return await risk_coastal_map.mosaic(LAYER, POINT["lat"], POINT["lon"], **kwargs)
+        finally:
+            await http_client.close()
+    return asyncio.run(go())
+
+
+def cached_tiles():
+    return sorted(
+        os.path.relpath(os.path.join(root, name), tile_cache.TILE_CACHE_DIR)
+        for root, _, names in os.walk(tile_cache.TILE_CACHE_DIR) for name in names
+    )
+
+
+def test_full_mosaic_caches_every_tile(miteco):
+    image, failed = mosaic()
+
+    assert failed == 0
+    assert image.size == (3 * tile_cache.TILE_SIZE,) * 2
+    assert image.getpixel((0, 0)) == (0, 0, 255, 120)
+    assert len(cached_tiles()) == 9
+
+
+def test_failed_tiles_are_left_transparent_and_not_cached(miteco):
+    # The point's own tile is cached; MITECO is down for the rest
+    x, y = tile_cache.tile_for(POINT["lat"], POINT["lon"], 18)
+    tile_cache.write(risk_coastal_map.tile_path(LAYER, 18, x, y), png((255, 0, 0, 255)))
+    del miteco.recordings["miteco"][f"GetMap:{LAYER}"]
+
+    image, failed = mosaic()
+
+    assert failed == 8
+    assert image.getpixel((0, 0)) == (0, 0, 0, 0)
+    assert image.getpixel((tile_cache.TILE_SIZE, tile_cache.TILE_SIZE)) == (255, 0, 0, 255)
+    assert cached_tiles() == [os.path.join(LAYER, "18", str(x), f"{y}.png")]
+
+
+def test_wms_exceptions_are_not_cached_as_tiles(miteco):
+    miteco.recordings["miteco"][f"GetMap:{LAYER}"] = {
+        "status": 200, "content_type": "application/vnd.ogc.se_xml", "body": "<ServiceExceptionReport/>",
+    }
+
+    _, failed = mosaic(radius=0)
+
+    assert failed == 1
+    assert cached_tiles() == []
+
+
+# === /coastal/mosaic headers, with get_tile faked ===
+@pytest.fixture
+def tiles(monkeypatch):
+    """
+    Tiles served by a fake get_tile; add (x, y) offsets from the point's tile to `down` to fail them.
+    """
+    down = set()
+    cx, cy = tile_cache.tile_for(POINT["lat"], POINT["lon"], 18)
+
+    async def get_tile(layer, zoom, x, y):
+        if (x - cx, y - cy) in down:
+            raise ValueError("MITECO returned text/xml")
+        return BLUE
+
+    monkeypatch.setattr(risk_coastal_map, "get_tile", get_tile)
+    return down
+
+
+def test_full_mosaic_is_public_with_an_etag(client, tiles):
+    response = client.get("/coastal/mosaic", params=POINT)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+    assert response.headers["ETag"]
+
+
+def test_partial_mosaic_is_no_store_without_an_etag(client, tiles):
+    tiles.add((1, 0))
+
+    response = client.get("/coastal/mosaic", params=POINT)
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in response.headers
+
+
+def test_mosaic_with_every_tile_failed_is_502(client, tiles):
+    tiles.update((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+    response = client.get("/coastal/mosaic", params=POINT)
+
+    assert response.status_code == 502
+    assert "ETag" not in response.headers
+    assert not response.headers.get("Cache-Control", "").startswith("public")
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import datasets
+import main  # registers the app's datasets before the registry fixture sets them aside
+
+# === Dataset registry: failures, backoff and retries ===
+BACKOFF = 0.2
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    An empty registry (the app's real datasets are set aside) with a short retry backoff.
+    """
+    for name in ("_loaders", "_sources", "_status", "_done", "_values", "_retry_at"):
+        monkeypatch.setattr(datasets, name, {})
+    monkeypatch.setattr(datasets, "_executor", None)
+    monkeypatch.setattr(datasets, "DATASET_RETRY_BACKOFF", BACKOFF)
+    monkeypatch.setattr(datasets, "DATASET_WAIT_TIMEOUT", 0)
+    yield datasets
+    if datasets._executor is not None:
+        datasets._executor.shutdown(wait=True)
+
+
+class FlakyLoader:
+    """
+    Fails the first `failures` calls, then returns "loaded"; optionally slow.
+    """
+
+    def __init__(self, failures, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if call <= self.failures:
+            raise FileNotFoundError("missing.shp")
+        return "loaded"
+
+
+def fail_once(registry, loader):
+    registry.register("flaky", loader)
+    registry.start_loading()
+    registry.wait_all()
+    assert registry.status()["flaky"]["state"] == "failed"
+
+
+def test_failed_dataset_is_not_reloaded_during_backoff(registry):
+    loader = FlakyLoader(failures=1)
+    fail_once(registry, loader)
+
+    for _ in range(20):
+        with pytest.raises(datasets.DatasetNotReady) as error:
+            registry.get("flaky")
+        assert error.value.state == "failed"
+    assert loader.calls == 1
+
+
+def test_retry_after_backoff_succeeds(registry):
+    loader = FlakyLoader(failures=1, delay=0.05)
+    fail_once(registry, loader)
+    time.sleep(BACKOFF)
+
+    assert registry.get("flaky", timeout=5) == "loaded"  # waits for the retry it started
+    assert loader.calls == 2
+    assert registry.status()["flaky"]["state"] == "ready"
+    assert registry.status()["flaky"]["failures"] == 0
+
+
+def test_wait_all_waits_for_a_requeued_attempt(registry):
+    loader = FlakyLoader(failures=1, delay=0.1)
+    fail_once(registry, loader)
+    time.sleep(BACKOFF)
+
+    registry.start_loading()
+    assert registry.status()["flaky"]["state"] in ("queued", "loading")
+    assert registry.wait_all(timeout=5) is True
+
+
+def test_backoff_doubles_with_consecutive_failures(registry):
+    loader = FlakyLoader(failures=2)
+    fail_once(registry, loader)
+    first = registry._retry_at["flaky"] - time.time()
+
+    registry.start_loading(["flaky"], retry=True)  # explicit retry skips the backoff
+    registry.wait_all()
+    second = registry._retry_at["flaky"] - time.time()
+
+    assert loader.calls == 2
+    assert registry.status()["flaky"]["failures"] == 2
+    assert first == pytest.approx(BACKOFF, abs=0.1)
+    assert second == pytest.approx(2 * BACKOFF, abs=0.1)
+
+
+def test_ready_probe_turns_200_once_the_retry_succeeds(client, registry):
+    loader = FlakyLoader(failures=1)
+    fail_once(registry, loader)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["datasets"]["flaky"]["state"] == "failed"
+
+    registry.start_loading(retry=True)
+    registry.wait_all()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pytest
+
+import fluvial_rasters
+
+# === Local fluvial depth grids: ingest, then sample ===
+# Grids are ingested with crs="EPSG:4326", so grid coordinates are lon/lat.
+# 3 x 2 cells of 0.1 degrees from (2.0, 41.0): row 0 is the northern one.
+HEADER = "ncols 3\nnrows 2\nxllcorner 2.0\nyllcorner 41.0\ncellsize 0.1\n"
+
+POINTS = {
+    "top left": (41.15, 2.05),
+    "top middle": (41.15, 2.15),
+    "bottom right": (41.05, 2.25),
+    "west of grid": (41.15, 1.95),
+    "south of grid": (40.95, 2.05),
+}
+
+
+@pytest.fixture
+def grids(tmp_path, monkeypatch):
+    monkeypatch.setattr(fluvial_rasters, "rasters", {period: [] for period in fluvial_rasters.PERIODS})
+    monkeypatch.setattr(fluvial_rasters, "version", None)
+
+    def ingest(period, text, name="grid"):
+        source = tmp_path / f"{name}.asc"
+        source.write_text(text, encoding="utf-8")
+        fluvial_rasters.ingest(period, [str(source)], crs="EPSG:4326", directory=str(tmp_path / "out"))
+        fluvial_rasters.load_rasters(str(tmp_path / "out"))
+
+    return ingest
+
+
+def sample_all(period):
+    lats, lons = zip(*POINTS.values())
+    return dict(zip(POINTS, fluvial_rasters.sample_many(period, lats, lons)))
+
+
+def test_grid_with_nodata_value(grids):
+    grids("100", HEADER + "NODATA_value -9999\n0.5 -9999 1.5\n0 2.25 3\n")
+    depths = sample_all("100")
+
+    assert depths["top left"] == pytest.approx(0.5)
+    assert depths["top middle"] == 0.0  # NODATA inside the grid: covered, not flooded
+    assert depths["bottom right"] == pytest.approx(3.0)
+    assert math.isnan(depths["west of grid"])
+    assert math.isnan(depths["south of grid"])
+
+
+def test_grid_without_nodata_value(grids):
+    # The first data row must not be taken for a header line
+    grids("100", HEADER + "0.5 1 1.5\n0 2.25 3\n")
+    depths = sample_all("100")
+
+    assert depths["top left"] == pytest.approx(0.5)
+    assert depths["top middle"] == pytest.approx(1.0)
+    assert depths["bottom right"] == pytest.approx(3.0)
+    assert math.isnan(depths["west of grid"])
+
+
+def test_float_min_cells_are_nodata(grids):
+    grids("100", HEADER + "-3.4028234663852886e+38 1 1.5\n0 2.25 3\n")
+    assert fluvial_rasters.sample("100", *POINTS["top left"]) == 0.0
+
+
+def test_sample_single_point(grids):
+    grids("500", HEADER + "NODATA_value -9999\n0.5 -9999 1.5\n0 2.25 3\n")
+
+    assert fluvial_rasters.sample("500", *POINTS["bottom right"]) == pytest.approx(3.0)
+    assert fluvial_rasters.sample("500", *POINTS["south of grid"]) is None
+    assert fluvial_rasters.sample("10", *POINTS["top left"]) is None  # no grid for the period
+    assert fluvial_rasters.version is not None
+
+
+def test_later_grids_fill_points_earlier_ones_miss(grids):
+    grids("10", HEADER + "1 1 1\n1 1 1\n", name="a")
+    grids("10", "ncols 1\nnrows 1\nxllcorner 1.9\nyllcorner 41.1\ncellsize 0.1\n7\n", name="b")
+
+    assert fluvial_rasters.sample("10", *POINTS["west of grid"]) == pytest.approx(7.0)
+    assert fluvial_rasters.sample("10", *POINTS["top left"]) == pytest.approx(1.0)
+
+
+def test_to_tiles_layout():
+    data = np.arange(15, dtype=np.float32).reshape(3, 5)
+    tiles = fluvial_rasters.to_tiles(data, tile=2)
+
+    assert tiles.shape == (2, 3, 2, 2)
+    for row in range(3):
+        for col in range(5):
+            assert tiles[row // 2, col // 2, row % 2, col % 2] == data[row, col]
+    assert np.isnan(tiles[1, 2, 1, 1])  # padding
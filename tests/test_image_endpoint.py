@@ -0,0 +1,71 @@
+import pytest
+from PIL import Image
+
+import main
+import result_cache
+
+# === /risk/image/{layer} ===
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+
+    def render(lat, lon):
+        calls.append((lat, lon))
+        return Image.new("RGB", (60, 50), (200, 40, 40))
+
+    monkeypatch.setitem(main.IMAGE_LAYERS, "desert", render)
+    monkeypatch.setattr(result_cache, "hazard_version", lambda hazard: "v1")
+    return calls
+
+
+def get_image(client, layer="desert", headers=None, **params):
+    return client.get(f"/risk/image/{layer}", params={"lat": 41.27, "lon": 2.05, **params}, headers=headers)
+
+
+def test_unknown_layer_is_404(client, renders):
+    assert get_image(client, "floods").status_code == 404
+
+
+def test_unsupported_format_is_400(client, renders):
+    assert get_image(client, format="gif").status_code == 400
+    assert renders == []
+
+
+@pytest.mark.parametrize("format, media_type, magic", [
+    ("jpeg", "image/jpeg", b"\xff\xd8"),
+    ("png", "image/png", b"\x89PNG"),
+    ("webp", "image/webp", b"RIFF"),
+])
+def test_content_type_per_format(client, renders, format, media_type, magic):
+    response = get_image(client, format=format)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+    assert response.content.startswith(magic)
+    assert response.headers["etag"]
+
+
+def test_matching_etag_is_304_without_rendering(client, renders):
+    etag = get_image(client).headers["etag"]
+    response = get_image(client, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(renders) == 1
+
+
+def test_etag_changes_with_format_and_dataset_version(client, renders, monkeypatch):
+    etag = get_image(client).headers["etag"]
+    assert get_image(client, format="png").headers["etag"] != etag
+    assert get_image(client, headers={"If-None-Match": etag}, format="png").status_code == 200
+
+    monkeypatch.setattr(result_cache, "hazard_version", lambda hazard: "v2")
+    response = get_image(client, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_no_etag_while_loading(client, renders, monkeypatch):
+    monkeypatch.setattr(result_cache, "hazard_version", lambda hazard: None)
+    response = get_image(client)
+    assert response.status_code == 200
+    assert "etag" not in response.headers
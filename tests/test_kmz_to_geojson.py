@@ -0,0 +1,57 @@
+import pytest
+
+from kmz_to_geojson import extract_description_data
+
+# === Description parsing, checked against the BeautifulSoup parser it replaced ===
+# MITECO's KML descriptions are an outer table with the data in a nested one.
+# The HTML arrives escaped once more than it is rendered, so after the first
+# unescape the cells still hold entities.
+ESCAPED_DESCRIPTION = (
+    "&lt;html&gt;&lt;body&gt;&lt;table&gt;&lt;tr&gt;&lt;td&gt;"
+    "&lt;table border=&quot;1&quot;&gt;"
+    "&lt;tr bgcolor=&quot;#E3E3F3&quot;&gt;&lt;td&gt;T&amp;eacute;rmino municipal:&lt;/td&gt;"
+    "&lt;td&gt; Vilanova i la Geltr&amp;uacute; &lt;/td&gt;&lt;/tr&gt;"
+    "&lt;tr&gt;&lt;td&gt;N&amp;#186; de incendios&lt;/td&gt;&lt;td&gt;1.234&amp;nbsp;&lt;/td&gt;&lt;/tr&gt;"
+    "&lt;tr&gt;&lt;td&gt;Superficie &amp;amp; ha&lt;/td&gt;&lt;td&gt;&lt;b&gt;12,5&lt;/b&gt; ha&lt;/td&gt;&lt;/tr&gt;"
+    "&lt;tr&gt;&lt;td colspan=&quot;2&quot;&gt;Fuente: MITECO&lt;/td&gt;&lt;/tr&gt;"
+    "&lt;/table&gt;&lt;/td&gt;&lt;/tr&gt;&lt;/table&gt;&lt;/body&gt;&lt;/html&gt;"
+)
+
+PLAIN_DESCRIPTION = (
+    "<table><tr><td><table>"
+    "<tr><td>Provincia:</td><td>Le&oacute;n</td></tr>"
+    "<tr><td>Nº de incendios</td><td>  87 </td></tr>"
+    "</table></td></tr></table>"
+)
+
+
+def soup_description_data(description_html):
+    # The original implementation
+    bs4 = pytest.importorskip("bs4")
+    from html import unescape
+
+    result = {}
+    soup = bs4.BeautifulSoup(unescape(description_html), "html.parser")
+    for row in soup.find("table").find("table").find_all("tr"):
+        cells = row.find_all("td")
+        if len(cells) != 2:
+            continue
+        result[cells[0].get_text(strip=True).strip(":")] = cells[1].get_text(strip=True)
+    return result
+
+
+def test_entities_in_cells_are_decoded():
+    assert extract_description_data(ESCAPED_DESCRIPTION) == {
+        "Término municipal": "Vilanova i la Geltrú",
+        "Nº de incendios": "1.234",
+        "Superficie & ha": "12,5ha",
+    }
+
+
+@pytest.mark.parametrize("description", [ESCAPED_DESCRIPTION, PLAIN_DESCRIPTION], ids=["escaped", "plain"])
+def test_matches_beautifulsoup(description):
+    assert extract_description_data(description) == soup_description_data(description)
+
+
+def test_missing_description():
+    assert extract_description_data(None) == {}
@@ -0,0 +1,148 @@
+import asyncio
+import re
+import time
+
+import pytest
+
+import main
+import metrics
+import result_cache
+import risk_seismic
+
+# === metrics: spans, the Server-Timing header and the /metrics exposition ===
+
+
+@pytest.fixture(autouse=True)
+def fresh():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def durations(header):
+    """
+    Server-Timing header -> {name: (milliseconds, desc or None)}.
+    """
+    parsed = {}
+    for part in header.split(", "):
+        match = re.fullmatch(r'([\w.]+);dur=(\d+\.\d)(?:;desc="([^"]*)")?', part)
+        assert match, part
+        parsed[match[1]] = (float(match[2]), match[3])
+    return parsed
+
+
+def test_nested_spans_are_all_recorded_in_the_request():
+    timings, token = metrics.start_request()
+    try:
+        with metrics.span("outer") as outer:
+            with metrics.span("inner") as inner:
+                time.sleep(0.01)
+    finally:
+        metrics.end_request(token)
+
+    # Inner spans finish first
+    assert [name for name, _ in timings] == ["inner", "outer"]
+    assert inner.seconds >= 0.01
+    assert outer.seconds >= inner.seconds
+    assert dict(timings) == {"inner": inner.seconds, "outer": outer.seconds}
+
+
+def test_spans_outside_a_request_only_feed_the_histograms():
+    with metrics.span("idle"):
+        pass
+
+    assert 'envrisk_stage_seconds_count{stage="idle"} 1' in metrics.render()
+
+
+def test_timed_records_sync_async_and_threaded_calls_in_the_request():
+    @metrics.timed("sync")
+    def sync():
+        return "s"
+
+    @metrics.timed("async")
+    async def run():
+        # Threads started with to_thread copy the context, so they share the request's timings
+        return await asyncio.to_thread(sync)
+
+    async def request():
+        timings, token = metrics.start_request()
+        try:
+            return await run(), timings
+        finally:
+            metrics.end_request(token)
+
+    result, timings = asyncio.run(request())
+
+    assert result == "s"
+    assert [name for name, _ in timings] == ["sync", "async"]
+    assert run.__name__ == "run"
+
+
+def test_server_timing_sums_repeated_stages():
+    header = metrics.server_timing([("upstream", 0.010), ("query", 0.0021), ("upstream", 0.0305)], total=0.05)
+
+    assert header == 'upstream;dur=40.5;desc="2 calls", query;dur=2.1, total;dur=50.0'
+    assert metrics.server_timing([]) == ""
+
+
+def test_render_histograms_counters_and_hit_ratio():
+    metrics.observe("envrisk_stage_seconds", 0.003, stage="query")
+    metrics.observe("envrisk_stage_seconds", 20.0, stage="query")
+    metrics.inc("envrisk_upstream_requests_total", host='a"b', outcome="ok")
+    for hit in (True, True, False):
+        metrics.cache("wms", hit)
+
+    lines = metrics.render().splitlines()
+
+    assert "# HELP envrisk_stage_seconds " + metrics._help["envrisk_stage_seconds"] in lines
+    assert "# TYPE envrisk_stage_seconds histogram" in lines
+    # Buckets are cumulative; 20s only lands in +Inf
+    assert 'envrisk_stage_seconds_bucket{stage="query",le="0.0025"} 0' in lines
+    assert 'envrisk_stage_seconds_bucket{stage="query",le="0.005"} 1' in lines
+    assert 'envrisk_stage_seconds_bucket{stage="query",le="10.0"} 1' in lines
+    assert 'envrisk_stage_seconds_bucket{stage="query",le="+Inf"} 2' in lines
+    assert 'envrisk_stage_seconds_sum{stage="query"} 20.003000' in lines
+    assert 'envrisk_stage_seconds_count{stage="query"} 2' in lines
+    assert "# TYPE envrisk_upstream_requests_total counter" in lines
+    assert 'envrisk_upstream_requests_total{host="a\\"b",outcome="ok"} 1' in lines
+    assert 'envrisk_cache_requests_total{cache="wms",result="hit"} 2' in lines
+    assert "# TYPE envrisk_cache_hit_ratio gauge" in lines
+    assert 'envrisk_cache_hit_ratio{cache="wms"} 0.6667' in lines
+    # Each metric family gets its header once
+    assert lines.count("# TYPE envrisk_cache_requests_total counter") == 1
+
+
+def test_endpoint_sends_stage_timings(client, monkeypatch):
+    async def fake_run(lat, lon, layers=None):
+        for _ in range(2):
+            with metrics.span("upstream"):
+                await asyncio.sleep(0)
+        return {"layers": layers}
+
+    monkeypatch.setattr(risk_seismic, "run", fake_run)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", False)
+
+    response = client.get("/risk/seismic", params={"lat": 41.27, "lon": 2.05})
+
+    assert response.status_code == 200
+    stages = durations(response.headers["Server-Timing"])
+    assert list(stages) == ["upstream", "provider.seismic", "total"]
+    assert stages["upstream"][1] == "2 calls"
+    assert stages["provider.seismic"][0] <= stages["total"][0]
+
+
+def test_server_timing_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(main, "SERVER_TIMING", False)
+
+    assert "Server-Timing" not in client.get("/metrics").headers
+
+
+def test_metrics_endpoint_exposes_request_latency(client):
+    first = client.get("/metrics")
+    assert first.headers["Server-Timing"].startswith("total;dur=")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'envrisk_request_seconds_count{method="GET",route="/metrics",status="200"} 1' in response.text
@@ -0,0 +1,142 @@
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+import result_cache
+import risk_seismic
+import sqlite_cache
+
+# === result_cache through /risk/seismic, with the provider faked ===
+POINT = {"lat": 41.27, "lon": 2.05}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_PRECISION", "")
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_PATH", str(tmp_path / "result_cache.sqlite3"))
+    monkeypatch.setattr(result_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(result_cache, "_bytes", 0)
+    result_cache._table.reset()
+
+
+@pytest.fixture
+def seismic(cache, monkeypatch):
+    """
+    Fake seismic provider: records its calls and returns `answer`; `version` is
+    the version the result cache sees for the seismic store.
+    """
+    fake = SimpleNamespace(calls=[], answer={"magnitude": 4.2}, version="v1")
+
+    async def run(lat, lon, layers=None):
+        fake.calls.append((lat, lon, tuple(layers)))
+        return dict(fake.answer)
+
+    monkeypatch.setattr(risk_seismic, "run", run)
+    monkeypatch.setitem(result_cache.LOCAL_STORE_VERSIONS, "seismic", lambda: fake.version)
+    return fake
+
+
+def test_matching_etag_gets_304(client, seismic):
+    first = client.get("/risk/seismic", params=POINT)
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "miss"
+    etag = first.headers["ETag"]
+
+    second = client.get("/risk/seismic", params=POINT, headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+    assert second.headers["X-Cache"] == "hit"
+    assert len(seismic.calls) == 1
+
+    other = client.get("/risk/seismic", params=POINT, headers={"If-None-Match": '"stale"'})
+    assert other.status_code == 200
+    assert other.json() == first.json()
+
+
+def test_error_results_are_no_store_and_never_cached(client, seismic):
+    seismic.answer = {"error": "IGN did not answer"}
+
+    for _ in range(2):
+        response = client.get("/risk/seismic", params=POINT)
+        assert response.status_code == 200
+        assert response.json() == {"seismic": {"error": "IGN did not answer"}}
+        assert response.headers["Cache-Control"] == "no-store"
+        assert "ETag" not in response.headers
+
+    assert len(seismic.calls) == 2
+    assert not result_cache._entries
+
+
+def test_dataset_version_change_misses(client, seismic):
+    client.get("/risk/seismic", params=POINT)
+    assert client.get("/risk/seismic", params=POINT).headers["X-Cache"] == "hit"
+
+    seismic.version = "v2"
+    response = client.get("/risk/seismic", params=POINT)
+
+    assert response.headers["X-Cache"] == "miss"
+    assert len(seismic.calls) == 2
+
+
+def test_expired_entries_miss(client, seismic, monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_UPSTREAM_TTL", 0.05)
+    client.get("/risk/seismic", params=POINT)
+    assert client.get("/risk/seismic", params=POINT).headers["X-Cache"] == "hit"
+
+    time.sleep(0.1)
+    response = client.get("/risk/seismic", params=POINT)
+
+    assert response.headers["X-Cache"] == "miss"
+    assert len(seismic.calls) == 2
+
+
+def test_store_answers_after_the_lru_is_dropped(client, seismic, monkeypatch):
+    etag = client.get("/risk/seismic", params=POINT).headers["ETag"]
+    monkeypatch.setattr(result_cache, "_entries", OrderedDict())  # e.g. another worker
+
+    response = client.get("/risk/seismic", params=POINT)
+
+    assert response.headers["X-Cache"] == "hit"
+    assert response.headers["ETag"] == etag
+    assert len(seismic.calls) == 1
+
+
+def test_store_evicts_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_STORE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(sqlite_cache, "EVICT_EVERY", 1)
+
+    result_cache.put("a", b"{}")
+    result_cache.put("b", b"{}")
+    result_cache._store_get("a")  # a is now more recent than b
+    result_cache.put("c", b"{}")
+
+    assert result_cache._store_get("a") is not None
+    assert result_cache._store_get("b") is None
+    assert result_cache._store_get("c") is not None
+
+
+def test_max_age_follows_short_lived_layers(client, seismic):
+    # Ultimos10dias is kept for 5 minutes, NZ.ObservedEvent for a day
+    params = dict(POINT, layers="Ultimos10dias,NZ.ObservedEvent")
+
+    first = client.get("/risk/seismic", params=params)
+    assert first.headers["Cache-Control"] == "private, max-age=300"
+
+    # Two minutes later
+    (key, entry), = result_cache._entries.items()
+    result_cache._remember(key, entry._replace(expires_at=time.time() + 120))
+    second = client.get("/risk/seismic", params=params)
+
+    assert second.headers["X-Cache"] == "hit"
+    assert second.headers["Cache-Control"] == "private, max-age=120"
+
+
+def test_static_layers_get_the_full_max_age(client, seismic):
+    response = client.get("/risk/seismic", params=dict(POINT, layers="HazardArea2002.NCSE-02"))
+
+    assert response.headers["Cache-Control"] == f"private, max-age={result_cache.RESULT_MAX_AGE}"
@@ -0,0 +1,82 @@
+import asyncio
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+import datasets
+import http_client
+import risk_seismic
+import seismic_zones
+import zone_store
+
+# === seismic_zones: local zone store lookups and risk_seismic answering from it ===
+LAYER = "HazardArea2002.NCSE-02"
+
+
+@pytest.fixture
+def zones(tmp_path, monkeypatch):
+    """
+    LAYER ingested into tmp_path (two side-by-side zones) and loaded, with the
+    app's real datasets set aside.
+    """
+    for name in ("_loaders", "_sources", "_status", "_done", "_values", "_retry_at"):
+        monkeypatch.setattr(datasets, name, {})
+    monkeypatch.setattr(datasets, "_executor", None)
+
+    store = zone_store.ZoneStore("seismic", str(tmp_path), seismic_zones.LOCAL_LAYERS)
+    monkeypatch.setattr(seismic_zones, "store", store)
+    frame = gpd.GeoDataFrame(
+        {"ac": [0.08, 0.16], "zona": ["A", "B"]},
+        geometry=[box(2.0, 41.0, 2.1, 41.1), box(2.1, 41.0, 2.2, 41.1)],
+        crs="EPSG:4326",
+    )
+    store.write(LAYER, frame, numeric=["ac"])
+    store.register()
+    yield store
+    if datasets._executor is not None:
+        datasets._executor.shutdown(wait=True)
+
+
+def load():
+    datasets.start_loading()
+    assert datasets.wait_all(timeout=10)
+
+
+def test_point_in_zone_returns_its_feature(zones):
+    load()
+
+    assert seismic_zones.lookup(LAYER, 41.05, 2.15) == [
+        {"id": f"{LAYER}.1", "properties": {"ac": 0.16, "zona": "B"}, "geometry": None},
+    ]
+
+
+def test_point_outside_every_zone_returns_no_features(zones):
+    load()
+
+    assert seismic_zones.lookup(LAYER, 40.0, 2.05) == []
+
+
+def test_layers_without_a_loaded_store_are_left_to_ign(zones):
+    assert zones.available == {f"seismic_{LAYER}"}
+    # Registered but not loaded yet
+    assert seismic_zones.lookup(LAYER, 41.05, 2.15) is None
+    load()
+    # Never ingested
+    assert seismic_zones.lookup("HazardArea2015.Int475", 41.05, 2.15) is None
+
+
+def test_run_answers_ingested_layers_without_asking_ign(zones, monkeypatch):
+    load()
+
+    async def no_upstream(*args, **kwargs):
+        raise AssertionError("IGN was asked")
+
+    monkeypatch.setattr(http_client, "get_feature_info", no_upstream)
+
+    result = asyncio.run(risk_seismic.run(41.05, 2.05, layers=[LAYER]))
+
+    assert result[LAYER]["features"] == [
+        {"id": f"{LAYER}.0", "properties": {"ac": 0.08, "zona": "A"}, "geometry": None},
+    ]
+    assert "error" not in result[LAYER]
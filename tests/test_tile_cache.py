@@ -0,0 +1,36 @@
+import asyncio
+import os
+import threading
+
+import tile_cache
+
+# === tile_cache writes and single-flight tile production ===
+
+
+def test_concurrent_writes_publish_whole_tiles(tmp_path):
+    tile_path = str(tmp_path / "layer" / "18" / "1" / "2.png")
+    contents = [bytes([i]) * 200_000 for i in range(8)]
+    threads = [threading.Thread(target=tile_cache.write, args=(tile_path, c)) for c in contents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tile_cache.read(tile_path) in contents
+    assert os.listdir(os.path.dirname(tile_path)) == ["2.png"]  # no temp files left behind
+
+
+def test_concurrent_misses_share_one_render():
+    calls = []
+
+    async def render():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"tile"
+
+    async def go():
+        return await asyncio.gather(*(tile_cache.single_flight(("test", 5, 1, 2), render) for _ in range(10)))
+
+    assert asyncio.run(go()) == [b"tile"] * 10
+    assert len(calls) == 1
+    assert tile_cache._inflight == {}
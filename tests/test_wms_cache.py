@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+
+import http_client
+import sqlite_cache
+import wms_cache
+from benchmarks import fake_wms
+from risk_fluvial_flood import parse_gray_index
+
+# === wms_cache through http_client.get_feature_info, against benchmarks.fake_wms ===
+LAYER = "NZ.Flood.FluvialT100"
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = fake_wms.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def wms(server, tmp_path, monkeypatch):
+    server.requests = 0
+    server.recordings = fake_wms.load_recordings()  # tests may replace answers
+    monkeypatch.setattr(wms_cache, "WMS_CACHE_ENABLED", True)
+    monkeypatch.setattr(wms_cache, "WMS_CACHE_PATH", str(tmp_path / "wms_cache.sqlite3"))
+    wms_cache._table.reset()
+    return server
+
+
+def lookup(server, lat, lon, ttl=None, layer=LAYER):
+    return http_client.get_feature_info(
+        layer, lat, lon, fake_wms.service_urls(server)["IDEE_WMS_URL"],
+        params={"REQUEST": "GetFeatureInfo", "QUERY_LAYERS": layer},
+        parse=parse_gray_index, timeout=5, ttl=ttl,
+    )
+
+
+def run(coro_fn):
+    # One event loop per test, with the shared client opened and closed inside it
+    async def main():
+        await http_client.start()
+        try:
+            return await coro_fn()
+        finally:
+            await http_client.close()
+    return asyncio.run(main())
+
+
+def test_repeat_lookup_in_same_cell_is_a_hit(wms):
+    async def go():
+        first = await lookup(wms, 41.27001, 2.05001)
+        second = await lookup(wms, 41.27002, 2.05002)  # same ~10 m cell
+        return first, second
+
+    first, second = run(go)
+    assert first == second == pytest.approx(0.42)
+    assert wms.requests == 1
+    assert wms_cache.get(LAYER, 41.27, 2.05) is not None
+
+
+def test_entry_older_than_ttl_is_fetched_again(wms):
+    async def go():
+        await lookup(wms, 41.27, 2.05, ttl=0.05)
+        await asyncio.sleep(0.1)
+        await lookup(wms, 41.27, 2.05, ttl=0.05)
+        await lookup(wms, 41.27, 2.05, ttl=60)
+
+    run(go)
+    assert wms.requests == 2
+
+
+def test_least_recently_used_entries_are_evicted(wms, monkeypatch):
+    monkeypatch.setattr(wms_cache, "WMS_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(sqlite_cache, "EVICT_EVERY", 1)
+
+    async def go():
+        await lookup(wms, 41.0, 2.0)
+        await lookup(wms, 42.0, 2.0)
+        await lookup(wms, 41.0, 2.0)  # hit: 41.0 is now more recent than 42.0
+        await lookup(wms, 43.0, 2.0)  # third entry evicts 42.0
+
+    run(go)
+    assert wms.requests == 3
+    assert wms_cache.get(LAYER, 41.0, 2.0) is not None
+    assert wms_cache.get(LAYER, 42.0, 2.0) is None
+    assert wms_cache.get(LAYER, 43.0, 2.0) is not None
+
+
+def test_upstream_error_is_not_cached(wms):
+    wms.recordings["idee"][LAYER] = {"status": 503, "content_type": "text/plain", "body": "Service unavailable"}
+
+    async def go():
+        with pytest.raises(httpx.HTTPStatusError):
+            await lookup(wms, 41.27, 2.05)
+
+    run(go)
+    assert wms_cache.get(LAYER, 41.27, 2.05) is None
+
+
+def test_body_rejected_by_parse_is_not_cached(wms):
+    # WMS services report some errors as an XML exception with a 200
+    wms.recordings["idee"][LAYER] = {
+        "status": 200, "content_type": "text/xml",
+        "body": "<ServiceExceptionReport><ServiceException>Layer not queryable</ServiceException></ServiceExceptionReport>",
+    }
+
+    async def go():
+        with pytest.raises(ValueError):
+            await lookup(wms, 41.27, 2.05)
+
+    run(go)
+    assert wms_cache.get(LAYER, 41.27, 2.05) is None
@@ -0,0 +1,92 @@
+import asyncio
+import math
+import os
+import tempfile
+import time
+
+from utils import get_transformer
+
+# === Web Mercator tiles and their disk cache ===
+# Tile math for the z/x/y grid (EPSG:3857, origin top left) and a plain file
+# cache under TILE_CACHE_DIR shared by every worker on the host, used by the
+# coastal raster tile proxy and the vector tiles.
+TILE_SIZE = 256
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", "data/tiles")
+TILE_CACHE_TTL = float(os.getenv("TILE_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+MAX_ZOOM = 22
+
+_inflight = {}  # key -> task producing that tile
+
+ORIGIN_SHIFT = 2 * math.pi * 6378137 / 2.0
+INITIAL_RESOLUTION = 2 * math.pi * 6378137 / TILE_SIZE
+
+
+def tile_for(lat, lon, zoom):
+    """
+    (x, y) of the tile containing the point at `zoom`.
+    """
+    x, y = get_transformer("EPSG:4326", "EPSG:3857").transform(lon, lat)
+    resolution = INITIAL_RESOLUTION / (2**zoom)
+    return int((x + ORIGIN_SHIFT) / (TILE_SIZE * resolution)), int((ORIGIN_SHIFT - y) / (TILE_SIZE * resolution))
+
+
+def tile_bounds(tile_x, tile_y, zoom):
+    """
+    EPSG:3857 (minx, miny, maxx, maxy) of a tile.
+    """
+    resolution = INITIAL_RESOLUTION / (2**zoom)
+    minx = tile_x * TILE_SIZE * resolution - ORIGIN_SHIFT
+    maxx = (tile_x + 1) * TILE_SIZE * resolution - ORIGIN_SHIFT
+    miny = ORIGIN_SHIFT - (tile_y + 1) * TILE_SIZE * resolution
+    maxy = ORIGIN_SHIFT - tile_y * TILE_SIZE * resolution
+    return minx, miny, maxx, maxy
+
+
+def valid_tile(zoom, tile_x, tile_y):
+    return 0 <= zoom <= MAX_ZOOM and 0 <= tile_x < 2**zoom and 0 <= tile_y < 2**zoom
+
+
+def path(*parts):
+    return os.path.join(TILE_CACHE_DIR, *(str(p) for p in parts))
+
+
+def read(tile_path, ttl=TILE_CACHE_TTL):
+    """
+    Cached bytes at `tile_path`, or None if missing or older than ttl (None = never expires).
+    """
+    try:
+        if ttl is not None and time.time() - os.path.getmtime(tile_path) > ttl:
+            return None
+        with open(tile_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write(tile_path, content):
+    try:
+        os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+        # Write-then-rename through a unique temp file, so concurrent writers
+        # (threads or workers) never read or publish half a tile
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(tile_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, tile_path)
+        except OSError:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        print(f"⚠️ Tile cache write failed: {e}")
+
+
+async def single_flight(key, produce):
+    """
+    Await produce() for a missing tile; concurrent callers with the same `key`
+    share one in-flight call instead of each fetching or rendering it.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(produce())
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
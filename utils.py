@@ -7,86 +7,120 @@ from PIL import Image
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from matplotlib import cm
-from matplotlib.colors import Normalize
+from matplotlib.collections import PathCollection
+from matplotlib.colors import Normalize, to_rgba
 import base64
-import geopandas as gpd
+import numpy as np
+from matplotlib.path import Path
 from functools import lru_cache
 
-@lru_cache(maxsize=2)
+@lru_cache(maxsize=8)
 def get_transformer(from_crs, to_crs):
     return Transformer.from_crs(from_crs, to_crs, always_xy=True)
 
-def filter_polygons_near_point(polygons_with_values, lat, lon, max_km=100):
-    # Step 1: Separate valid geometries and values
-    geometries = []
-    values = []
-
-    for poly, val in polygons_with_values:
-        if isinstance(poly, (Polygon, MultiPolygon)) and poly.is_valid:
-            geometries.append(poly)
-            values.append(val)
-
-    # Step 2: Build GeoDataFrame in EPSG:4326
-    gdf = gpd.GeoDataFrame({'geometry': geometries, 'value': values}, geometry='geometry', crs='EPSG:4326')
-
-    # Step 3: Project to EPSG:25830 for filtering
-    gdf_proj = gdf.to_crs("EPSG:25830")
-
-    # Step 4: Project point to EPSG:25830
-    transformer_to_25830 = Transformer.from_crs("EPSG:4326", "EPSG:25830", always_xy=True)
-    x, y = transformer_to_25830.transform(lon, lat)
-    point_proj = Point(x, y)
-
-    buffer_m = max_km * 1000
-    bbox = box(x - buffer_m, y - buffer_m, x + buffer_m, y + buffer_m)
-
-    # Step 5: Spatial index query
-    sindex = gdf_proj.sindex
-    candidate_idx = list(sindex.intersection(bbox.bounds))
-    candidates_proj = gdf_proj.iloc[candidate_idx]
-    candidates_orig = gdf.iloc[candidate_idx]
-
-    # Step 6: Filter by centroid distance, return original geometries
-    nearby = []
-    for i, row_proj in candidates_proj.iterrows():
-        try:
-            centroid = row_proj.geometry.centroid
-            if point_proj.distance(centroid) <= buffer_m:
-                orig_geom = candidates_orig.loc[i].geometry
-                val = float(candidates_orig.loc[i].value) if candidates_orig.loc[i].value not in [None, ""] else 0.0
-                nearby.append((orig_geom, val))
-        except Exception as e:
-            print(f"⚠️ Skipping geometry: {e}")
-            
-    return nearby
+def parse_fire_count(properties):
+    """
+    Fire count from the "Nº de incendios"-style property, e.g. "1.234" -> 1234. None if absent.
+    """
+    for key, val in properties.items():
+        if "incendios" in key.lower():
+            try:
+                return int(val.replace(".", "").replace(",", ""))
+            except Exception as e:
+                print(f"⚠️ Could not parse fire count: {val}")
+    return None
+
+def _polygon_path(poly):
+    rings = [np.asarray(poly.exterior.coords)[:, :2]] + [np.asarray(r.coords)[:, :2] for r in poly.interiors]
+    vertices = np.concatenate(rings)
+    codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+    start = 0
+    for ring in rings:
+        codes[start] = Path.MOVETO
+        codes[start + len(ring) - 1] = Path.CLOSEPOLY
+        start += len(ring)
+    return Path(vertices, codes)
+
+def polygons_to_paths(geometries, facecolors):
+    """
+    Matplotlib paths (holes included) for Polygons and MultiPolygons, with each
+    face colour repeated for every part of a MultiPolygon. Other geometries are skipped.
+    """
+    paths = []
+    colors = []
+    for geom, color in zip(geometries, facecolors):
+        if geom is None:
+            continue
+        parts = geom.geoms if isinstance(geom, MultiPolygon) else [geom]
+        for part in parts:
+            if isinstance(part, Polygon) and not part.is_empty:
+                paths.append(_polygon_path(part))
+                colors.append(color)
+    return paths, colors
+
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+def encode_image(image, fmt="jpeg", quality=80):
+    """
+    Encode a PIL image as raw bytes in one of IMAGE_FORMATS.
+    """
+    pil_format, _ = IMAGE_FORMATS[fmt]
+    buf = BytesIO()
+    if pil_format == "PNG":
+        image.save(buf, format=pil_format, optimize=True)
+    else:
+        image.convert("RGB").save(buf, format=pil_format, quality=quality, optimize=True)
+    return buf.getvalue()
+
+def image_to_data_uri(image, quality=80):
+    return f"data:image/jpeg;base64,{base64.b64encode(encode_image(image, 'jpeg', quality)).decode('utf-8')}"
+
+def filter_polygons_near_point(centroid_index, lat, lon, max_km=100):
+    """
+    Return (polygon, value) pairs whose projected centroid is within max_km of the point.
+    `centroid_index` is a spatial_index.CentroidIndex built once at load time.
+    """
+    positions = centroid_index.near(lat, lon, max_km)
+    geometries = centroid_index.geometries[positions]
+    values = centroid_index.values[positions]
+    return list(zip(geometries, values.tolist()))
 
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from PIL import Image
 from io import BytesIO
 from matplotlib import pyplot as plt
-from matplotlib.colors import Normalize
-from matplotlib import cm
-from shapely.geometry import Polygon
+from matplotlib.colors import Normalize, to_rgba
 import base64
 
-def generate_fire_map(poly_and_values, lat, lon):
-    fire_counts = [v for _, v in poly_and_values if v is not None]
-    if not fire_counts:
-        return ""
+def render_fire_map(poly_and_values, lat, lon):
+    """
+    Draw the fire choropleth with the point marked. Returns a PIL image, or None with no data.
+    All polygons (MultiPolygon parts included) go into one PathCollection, coloured in one pass.
+    """
+    values = np.array([np.nan if v is None else v for _, v in poly_and_values], dtype=float)
+    known = ~np.isnan(values)
+    if not known.any():
+        return None
 
-    norm = Normalize(vmin=min(fire_counts), vmax=max(fire_counts))
-    cmap = cm.get_cmap("Reds")
+    norm = Normalize(vmin=values[known].min(), vmax=values[known].max())
+    facecolors = np.empty((len(values), 4))
+    facecolors[known] = matplotlib.colormaps["Reds"](norm(values[known]))
+    facecolors[~known] = to_rgba("#cccccc")
 
     fig = plt.figure(figsize=(6, 5), dpi=80)
     canvas = FigureCanvas(fig)
     ax = fig.add_axes([0, 0, 1, 1])
     ax.set_axis_off()
 
-    for poly, value in poly_and_values:
-        if isinstance(poly, Polygon):
-            color = cmap(norm(value)) if value is not None else "#cccccc"
-            ax.fill(*poly.exterior.xy, color=color, edgecolor="k", linewidth=0.2, alpha=0.7)
+    paths, colors = polygons_to_paths([poly for poly, _ in poly_and_values], facecolors)
+    if paths:
+        ax.add_collection(PathCollection(
+            paths, facecolors=colors, edgecolors="k", linewidths=0.2, alpha=0.7,
+        ))
 
     ax.plot(lon, lat, marker="x", color="black", markersize=8, markeredgewidth=2)
 
@@ -95,61 +129,29 @@ def generate_fire_map(poly_and_values, lat, lon):
 
     # ✅ Get the raw RGBA bytes and convert to Image
     image = Image.frombuffer("RGBA", (width, height), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
-    image = image.convert("RGB")  # Strip alpha to reduce file size
+    image = image.convert("RGB")  # Strip alpha (and copy out of the canvas buffer)
 
-    # Save to JPEG
-    buf = BytesIO()
-    image.save(buf, format="JPEG", quality=50, optimize=True)
-    buf.seek(0)
-
-    return_data = f"data:image/jpeg;base64,{base64.b64encode(buf.read()).decode('utf-8')}"
-    
     plt.close(fig)  # ✅ Close the figure to prevent memory leak
-    buf.close()
-    return return_data
+    return image
+
+def generate_fire_map(poly_and_values, lat, lon):
+    image = render_fire_map(poly_and_values, lat, lon)
+    return image_to_data_uri(image, quality=50) if image is not None else ""
 
 
-def filter_polygons_near_point_desert(gdf, lat, lon, max_km=100):
+def filter_polygons_near_point_desert(gdf, centroid_index, lat, lon, max_km=100):
     """
-    Use spatial index to find polygons within max_km of the point.
+    Return the rows of gdf whose centroid is within max_km of the point.
+    `centroid_index` is the spatial_index.CentroidIndex built over gdf's geometry at load time.
     """
-    # Transform point to projected coords (for distance in meters)
-    point_wgs = Point(lon, lat)
-    transformer = get_transformer("EPSG:4326", "EPSG:25830")
-    x, y = transformer.transform(lon, lat)
-
-    buffer_m = max_km * 1000
-    bbox = box(x - buffer_m, y - buffer_m, x + buffer_m, y + buffer_m)
-
-    # Reproject bbox back to WGS84 for filtering
-    transformer_back = Transformer.from_crs("EPSG:25830", "EPSG:4326", always_xy=True)
-    min_lon, min_lat = transformer_back.transform(bbox.bounds[0], bbox.bounds[1])
-    max_lon, max_lat = transformer_back.transform(bbox.bounds[2], bbox.bounds[3])
-    query_box = box(min_lon, min_lat, max_lon, max_lat)
-
-    # Use spatial index to pre-select candidates
-    possible_matches_index = list(gdf.sindex.intersection(query_box.bounds))
-    possible_matches = gdf.iloc[possible_matches_index]
+    return gdf.iloc[centroid_index.near(lat, lon, max_km)]
 
-    # Final filter: check exact distance to centroid in projected coords
-    point_proj = Point(x, y)
-    transformer_centroids = Transformer.from_crs("EPSG:4326", "EPSG:25830", always_xy=True)
 
-    def within_distance(row):
-        try:
-            centroid = row.geometry.centroid
-            cx, cy = transformer_centroids.transform(centroid.x, centroid.y)
-            return point_proj.distance(Point(cx, cy)) <= buffer_m
-        except:
-            return False
-
-    return possible_matches[possible_matches.apply(within_distance, axis=1)]
-
-
-def plot_full_dataset_with_point(GDF, lat, lon, risk_labels, risk_colors):
-    GDF = filter_polygons_near_point_desert(GDF, lat, lon, max_km=100)
-
-    point = Point(lon, lat)
+def render_desert_map(GDF, centroid_index, lat, lon, risk_colors):
+    """
+    Draw the desertification polygons within 100 km with the point marked, as a PIL image.
+    """
+    GDF = filter_polygons_near_point_desert(GDF, centroid_index, lat, lon, max_km=100).copy()
 
     fig, ax = plt.subplots(figsize=(6, 5))
 
@@ -162,23 +164,21 @@ def plot_full_dataset_with_point(GDF, lat, lon, risk_labels, risk_colors):
     # Remove all non-essentials
     ax.axis("off")
 
-    plt.tight_layout(pad=0)  # Minimize surrounding space
+    fig.tight_layout(pad=0)  # Minimize surrounding space
 
-    # Save to PNG buffer
+    # Save to PNG buffer (through the figure, not pyplot's "current" one,
+    # since fire and desert maps can render on different threads at once)
     buf_png = BytesIO()
-    plt.savefig(buf_png, format="png", dpi=100, bbox_inches="tight", pad_inches=0)
-    plt.close()
+    fig.savefig(buf_png, format="png", dpi=100, bbox_inches="tight", pad_inches=0)
+    plt.close(fig)
     buf_png.seek(0)
 
     with Image.open(buf_png) as image:
         image = image.convert("RGB")
-        buf_jpg = BytesIO()
-        image.save(buf_jpg, format="JPEG", quality=80, optimize=True)
-        buf_jpg.seek(0)
-        base64_img = base64.b64encode(buf_jpg.read()).decode("utf-8")
 
     buf_png.close()
-    buf_jpg.close()
-
-    return f"data:image/jpeg;base64,{base64_img}"
+    return image
 
+def plot_full_dataset_with_point(GDF, centroid_index, lat, lon, risk_labels, risk_colors):
+    image = render_desert_map(GDF, centroid_index, lat, lon, risk_colors)
+    return image_to_data_uri(image, quality=80)
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import os
+
+import numpy as np
+import shapely
+
+import data_load_desert
+import data_load_fire
+import datasets
+import metrics
+import tile_cache
+from utils import get_transformer, parse_fire_count
+
+# === Mapbox Vector Tiles of the fire and desertification layers ===
+# /tiles/{layer}/{z}/{x}/{y}.mvt is cut on demand from the in-memory polygon
+# indexes: an STRtree query for the tile (plus a small buffer), a vectorized
+# clip, reprojection to Web Mercator and simplification to the tile's pixel
+# size. Encoded tiles are kept in tile_cache under the datasets' version, so a
+# rebuilt dataset never serves stale tiles. `python vector_tiles.py build`
+# precomputes a zoom range.
+EXTENT = 4096  # MVT coordinate units per tile side
+BUFFER = 64  # units of extra geometry around the tile, so edges join cleanly
+MVT_MIN_ZOOM = int(os.getenv("MVT_MIN_ZOOM", "5"))  # below this tiles are empty
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+LAYERS = {
+    "fire_96_05": ("fire_9605",),
+    "fire_06_15": ("fire_0615",),
+    "desert": ("desert_peninsula", "desert_canarias", "desert_index"),
+}
+
+
+def fire_properties(period):
+    index = data_load_fire.get(period).index
+
+    def properties(position):
+        props = index.records[position]["properties"]
+        count = parse_fire_count(props)
+        return {
+            "fire_count": count if count is not None else -1,
+            "name": props.get("Término municipal", ""),
+        }
+    return index, properties
+
+
+def desert_properties():
+    index = data_load_desert.get_index()
+
+    def properties(position):
+        dataset, _, code = index.records[position]
+        return {"DESER_CLA": int(code), "dataset": dataset}
+    return index, properties
+
+
+SOURCES = {
+    "fire_96_05": lambda: fire_properties("9605"),
+    "fire_06_15": lambda: fire_properties("0615"),
+    "desert": desert_properties,
+}
+
+
+def layer_version(layer):
+    """
+    Version of the datasets behind `layer`; raises DatasetNotReady while any is loading.
+    """
+    versions = []
+    for name in LAYERS[layer]:
+        datasets.get(name)
+        versions.append(datasets.version(name))
+    return "-".join(versions)
+
+
+def render_tile(layer, zoom, tile_x, tile_y):
+    """
+    Encode one tile of `layer` from the loaded polygons.
+    """
+    index, properties = SOURCES[layer]()
+    minx, miny, maxx, maxy = tile_cache.tile_bounds(tile_x, tile_y, zoom)
+    features = []
+
+    if zoom >= MVT_MIN_ZOOM:
+        pad = (maxx - minx) * BUFFER / EXTENT
+        to_lonlat = get_transformer("EPSG:3857", "EPSG:4326")
+        west, south = to_lonlat.transform(minx - pad, miny - pad)
+        east, north = to_lonlat.transform(maxx + pad, maxy + pad)
+
+        with metrics.span("query.mvt"):
+            positions = np.sort(index.tree.query(shapely.box(west, south, east, north)))
+            clipped = shapely.clip_by_rect(index.geometries[positions], west, south, east, north)
+
+        with metrics.span("render.mvt"):
+            to_mercator = get_transformer("EPSG:4326", "EPSG:3857")
+            projected = shapely.transform(clipped, lambda xy: np.column_stack(to_mercator.transform(xy[:, 0], xy[:, 1])))
+            projected = shapely.simplify(projected, (maxx - minx) / EXTENT)
+            keep = ~(shapely.is_missing(projected) | shapely.is_empty(projected))
+            for position, geometry in zip(positions[keep].tolist(), projected[keep]):
+                features.append({"geometry": geometry, "properties": properties(position), "id": position})
+
+    import mapbox_vector_tile  # only needed where tiles are rendered
+
+    with metrics.span("encode.mvt"):
+        return mapbox_vector_tile.encode(
+            [{"name": layer, "features": features}],
+            default_options={"quantize_bounds": (minx, miny, maxx, maxy), "extents": EXTENT},
+        )
+
+
+def tile_path(layer, version, zoom, tile_x, tile_y):
+    return tile_cache.path("mvt", layer, version, zoom, tile_x, f"{tile_y}.mvt")
+
+
+def cached_tile(layer, zoom, tile_x, tile_y, version=None):
+    """
+    Encoded tile bytes, from tile_cache or freshly rendered (and then cached).
+    """
+    path = tile_path(layer, version or layer_version(layer), zoom, tile_x, tile_y)
+    content = tile_cache.read(path, ttl=None)  # keyed by dataset version, never stale
+    metrics.cache("mvt", content is not None)
+    if content is None:
+        content = render_tile(layer, zoom, tile_x, tile_y)
+        tile_cache.write(path, content)
+    return content
+
+
+async def get_tile(layer, zoom, tile_x, tile_y):
+    """
+    cached_tile() in a worker thread; concurrent requests for the same tile share one render.
+    """
+    version = layer_version(layer)
+    key = ("mvt", layer, version, zoom, tile_x, tile_y)
+    return await tile_cache.single_flight(
+        key, lambda: asyncio.to_thread(cached_tile, layer, zoom, tile_x, tile_y, version),
+    )
+
+
+def build(layer, min_zoom, max_zoom, bounds=(-18.4, 27.4, 4.6, 44.0)):
+    """
+    Render every tile of `layer` over `bounds` (lon/lat) for the zoom range into the cache.
+    """
+    for name in LAYERS[layer]:
+        datasets.load(name)
+    west, south, east, north = bounds
+    for zoom in range(min_zoom, max_zoom + 1):
+        x0, y0 = tile_cache.tile_for(north, west, zoom)
+        x1, y1 = tile_cache.tile_for(south, east, zoom)
+        for tile_x in range(x0, x1 + 1):
+            for tile_y in range(y0, y1 + 1):
+                cached_tile(layer, zoom, tile_x, tile_y)
+        print(f"✅ {layer} z{zoom}: {(x1 - x0 + 1) * (y1 - y0 + 1)} tiles")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute vector tiles into the tile cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build")
+    build_parser.add_argument("--layer", choices=LAYERS, action="append", help="default: all")
+    build_parser.add_argument("--min-zoom", type=int, default=MVT_MIN_ZOOM)
+    build_parser.add_argument("--max-zoom", type=int, default=10)
+    args = parser.parse_args()
+
+    for layer in args.layer or LAYERS:
+        build(layer, args.min_zoom, args.max_zoom)
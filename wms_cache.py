@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+import time
+
+import sqlite_cache
+
+# === Persistent GetFeatureInfo cache ===
+# Upstream answers are stored in SQLite keyed by layer and a snapped lat/lon
+# cell, so they survive restarts and are shared by every worker on the host.
+WMS_CACHE_ENABLED = os.getenv("WMS_CACHE_ENABLED", "1") != "0"
+WMS_CACHE_PATH = os.getenv("WMS_CACHE_PATH", "data/wms_cache.sqlite3")
+WMS_CACHE_GRID = float(os.getenv("WMS_CACHE_GRID", "0.0001"))  # degrees (~10 m)
+WMS_CACHE_TTL = float(os.getenv("WMS_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+WMS_CACHE_MAX_ENTRIES = int(os.getenv("WMS_CACHE_MAX_ENTRIES", "1000000"))
+
+_lock = threading.Lock()
+_table = sqlite_cache.Table(
+    "responses",
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " layer TEXT NOT NULL, grid REAL NOT NULL, cell_lat INTEGER NOT NULL, cell_lon INTEGER NOT NULL,"
+    " body TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+    " PRIMARY KEY (layer, grid, cell_lat, cell_lon))",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)",
+)
+
+
+def _connection():
+    return _table.connection(WMS_CACHE_PATH)
+
+
+def cell(lat, lon, grid=None):
+    grid = grid or WMS_CACHE_GRID
+    return round(lat / grid), round(lon / grid)
+
+
+def get(layer, lat, lon, ttl=None):
+    """
+    Cached response body for the cell containing (lat, lon), or None if missing or older than ttl.
+    """
+    if not WMS_CACHE_ENABLED:
+        return None
+    ttl = WMS_CACHE_TTL if ttl is None else ttl
+    cell_lat, cell_lon = cell(lat, lon)
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connection()
+            row = conn.execute(
+                "SELECT body, stored_at FROM responses WHERE layer=? AND grid=? AND cell_lat=? AND cell_lon=?",
+                (layer, WMS_CACHE_GRID, cell_lat, cell_lon),
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                return None
+            conn.execute(
+                "UPDATE responses SET accessed_at=? WHERE layer=? AND grid=? AND cell_lat=? AND cell_lon=?",
+                (now, layer, WMS_CACHE_GRID, cell_lat, cell_lon),
+            )
+            return row[0]
+    except sqlite3.Error as e:
+        print(f"⚠️ WMS cache read failed: {e}")
+        return None
+
+
+def put(layer, lat, lon, body):
+    if not WMS_CACHE_ENABLED:
+        return
+    cell_lat, cell_lon = cell(lat, lon)
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (layer, WMS_CACHE_GRID, cell_lat, cell_lon, body, now, now),
+            )
+            _table.wrote(conn, WMS_CACHE_MAX_ENTRIES)
+    except sqlite3.Error as e:
+        print(f"⚠️ WMS cache write failed: {e}")
+
+
+def clear():
+    with _lock:
+        _connection().execute("DELETE FROM responses")
@@ -0,0 +1,69 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+import datasets
+import geobundle
+from spatial_index import PolygonIndex
+
+# === Local zone stores ===
+# Polygon layers kept as one geobundle per layer and answered with a
+# point-in-polygon query. coastal_zones and seismic_zones each hold a
+# ZoneStore for their layers; register() adds the layers found on disk to
+# datasets, so they load with the others at startup. Layers without a store,
+# or still loading, are left to the upstream service.
+ZoneData = namedtuple("ZoneData", ["index", "bundle"])
+
+
+class ZoneStore:
+    """
+    Bundles of `layers` under `directory`, loaded as the datasets "{prefix}_{layer}".
+    """
+
+    def __init__(self, prefix, directory, layers):
+        self.prefix = prefix
+        self.directory = directory
+        self.layers = tuple(layers)
+        self.available = set()  # dataset names of the stored layers, filled in by register()
+
+    def bundle_path(self, layer, directory=None):
+        return os.path.join(directory or self.directory, f"{layer}.bundle")
+
+    def dataset_name(self, layer):
+        return f"{self.prefix}_{layer}"
+
+    def write(self, layer, gdf, numeric=(), directory=None):
+        """
+        Write `gdf` as the bundle for `layer`; returns (path, feature count).
+        """
+        path = self.bundle_path(layer, directory)
+        return path, geobundle.write_frame(path, gdf, numeric=numeric)
+
+    def load_layer(self, layer, directory=None):
+        bundle = geobundle.read_bundle(self.bundle_path(layer, directory))
+        return ZoneData(PolygonIndex(bundle.geometries, np.arange(len(bundle))), bundle)
+
+    def version(self):
+        """
+        Versions of the stored layers ("remote" for any still loading), for result_cache keys.
+        """
+        return ",".join(datasets.version(name) or "remote" for name in sorted(self.available))
+
+    def find(self, layer, lat, lon):
+        """
+        (bundle, position) of the zone containing the point, position None outside
+        every zone; None when the layer has no local store or is not loaded yet.
+        """
+        name = self.dataset_name(layer)
+        if name not in self.available or not datasets.is_ready(name):
+            return None
+        zones = datasets.get(name)
+        return zones.bundle, zones.index.find_position(lon, lat)
+
+    def register(self):
+        for layer in self.layers:
+            path = self.bundle_path(layer)
+            if os.path.isdir(path):
+                self.available.add(self.dataset_name(layer))
+                datasets.register(self.dataset_name(layer), lambda layer=layer: self.load_layer(layer), sources=(path,))